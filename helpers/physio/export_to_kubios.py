@@ -3,8 +3,24 @@ import pandas as pd
 import json
 import os
 import gzip
+import queue
+import tempfile
+import threading
 import numpy as np
 
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
 def load_sidecar(bids_tsv):
     """Loads the JSON sidecar associated with the TSV."""
     # Try .json, .tsv.json, .tsv.gz.json?
@@ -20,11 +36,60 @@ def load_sidecar(bids_tsv):
         json_path = base + '.json'
         
     if os.path.exists(json_path):
-        with open(json_path, 'r') as f:
-            return json.load(f)
+        with open(json_path, 'rb') as f:
+            return json_loads(f.read())
     return {}
 
-def export_to_edf(df, output_file, fs, ecg_col, marker_col):
+# Number of EDF records (seconds) read from the TSV per chunk
+CHUNK_SECONDS = 60
+
+def _compression(bids_tsv):
+    return 'gzip' if bids_tsv.endswith('.gz') else None
+
+def read_columns(bids_tsv):
+    """Reads only the header row of the TSV."""
+    return pd.read_csv(bids_tsv, sep='\t', compression=_compression(bids_tsv), nrows=0).columns.tolist()
+
+def iter_chunks(bids_tsv, columns, chunksize, ecg_col=None):
+    """
+    Yields DataFrames containing only `columns`.
+
+    Uses pyarrow's multithreaded C parser when available (chunk size is then
+    pyarrow's block size), otherwise pandas with chunks of `chunksize` rows.
+    The ECG column, if given, is parsed as float64 without type inference.
+    """
+    if PYARROW_AVAILABLE:
+        return _iter_chunks_arrow(bids_tsv, columns, ecg_col)
+    return pd.read_csv(
+        bids_tsv,
+        sep='\t',
+        compression=_compression(bids_tsv),
+        usecols=columns,
+        chunksize=chunksize,
+    )
+
+def _iter_chunks_arrow(bids_tsv, columns, ecg_col):
+    # open_csv streams record batches and decompresses .gz transparently
+    reader = pacsv.open_csv(
+        bids_tsv,
+        parse_options=pacsv.ParseOptions(delimiter='\t'),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=columns,
+            column_types={ecg_col: pa.float64()} if ecg_col else None,
+        ),
+    )
+    for batch in reader:
+        yield batch.to_pandas()
+
+def export_to_edf(bids_tsv, output_file, fs, ecg_col, marker_col):
+    """
+    Streams the TSV into an EDF+ file.
+
+    The TSV is parsed once in chunks of CHUNK_SECONDS records to find the
+    physical range and marker events (EDF headers must be written first).
+    The ECG samples are spooled to a temporary raw file meanwhile, which is
+    memory-mapped for writing, so only one chunk is held in memory at a time.
+    """
     try:
         import pyedflib
     except ImportError:
@@ -34,90 +99,119 @@ def export_to_edf(df, output_file, fs, ecg_col, marker_col):
     print(f"Exporting to EDF+ at {fs} Hz...")
     
     n_channels = 1
-    channel_info = []
-    
-    # ECG Channel
-    ch1 = {'label': 'ECG', 'dimension': 'uV', 'sample_frequency': fs, 'physical_max': df[ecg_col].max(), 'physical_min': df[ecg_col].min(), 'digital_max': 32767, 'digital_min': -32768, 'transducer': 'AgAgCl', 'prefilter': ''}
-    channel_info.append(ch1)
+    block_size = int(fs)
+    chunksize = block_size * CHUNK_SECONDS
+    columns = [ecg_col] + ([marker_col] if marker_col else [])
     
-    # We do NOT add marker as a signal channel in EDF+. We use Annotations.
-    # But if the user wants it as a signal (e.g. for visual inspection of the trigger line), we can add it.
-    # Kubios supports EDF Annotations. Let's try to convert the marker channel to annotations.
-    
-    annotations = []
-    if marker_col:
-        # Find changes in marker channel
-        # Assuming marker channel is 0 for no event, and >0 for event
-        # Or just changes.
-        # Let's look for non-zero values.
-        
-        # Simple logic: Find where marker != 0
-        # This depends on how markers are stored. Varioport often has 0 and then a code.
-        
-        markers = df[marker_col].values
-        # Find indices where marker changes or is non-zero
-        # If it's a trigger channel (pulses), we want the onset.
-        
-        # Get indices where value > 0
-        # This might be too many if it's a continuous high signal.
-        # Let's assume it's a trigger signal where we want onsets.
-        
-        # Find rising edges
-        # Pad with 0 at start
-        diffs = np.diff(markers, prepend=0)
-        # Onsets: where diff > 0 (or just != 0 if we track all changes)
-        # Let's track all changes for safety, or just positive values?
-        # Usually markers are discrete codes.
-        
-        # Let's iterate through changes to be safe
-        changes = np.where(diffs != 0)[0]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        spool_path = os.path.join(tmp_dir, 'ecg.f64')
         
-        for idx in changes:
-            val = markers[idx]
-            if val > 0: # Only mark start of events
-                onset = idx / fs
-                duration = 0 # Point event
-                description = str(int(val))
-                annotations.append((onset, duration, description))
+        # First pass: physical range of the ECG channel and marker onsets.
+        # We do NOT add marker as a signal channel in EDF+. We use Annotations,
+        # which Kubios supports. Markers are discrete codes (0 = no event), so
+        # an event starts wherever the value changes to something > 0.
+        physical_max = -np.inf
+        physical_min = np.inf
+        annotations = []
+        offset = 0
+        last_marker = 0
+        with open(spool_path, 'wb') as spool:
+            for chunk in iter_chunks(bids_tsv, columns, chunksize, ecg_col):
+                physical_max = max(physical_max, chunk[ecg_col].max())
+                physical_min = min(physical_min, chunk[ecg_col].min())
+                np.ascontiguousarray(chunk[ecg_col].values, dtype=np.float64).tofile(spool)
                 
-        print(f"Found {len(annotations)} marker events.")
-
-    try:
-        f = pyedflib.EdfWriter(output_file, n_channels, file_type=pyedflib.FILETYPE_EDFPLUS)
-        f.setSignalHeaders(channel_info)
+                if marker_col and len(chunk):
+                    markers = np.asarray(chunk[marker_col].values, dtype=np.float64)
+                    # Previous sample of each marker; the last value is carried
+                    # over so edges on chunk boundaries are found
+                    prev = np.empty_like(markers)
+                    prev[0] = last_marker
+                    prev[1:] = markers[:-1]
+                    # Only mark start of events (point events, duration 0)
+                    onset_idx = np.flatnonzero((markers != prev) & (markers > 0))
+                    onsets = (offset + onset_idx) / fs
+                    descriptions = map(str, markers[onset_idx].astype(np.int64).tolist())
+                    annotations.extend(zip(onsets.tolist(), [0] * len(onset_idx), descriptions))
+                    
+                    last_marker = markers[-1]
+                
+                offset += len(chunk)
         
-        # Write data in 1-second blocks (fs samples) to ensure correct EDF structure
-        data = df[ecg_col].values
-        block_size = int(fs)
-        n_samples = len(data)
+        if marker_col:
+            print(f"Found {len(annotations)} marker events.")
         
-        # Pad data if necessary to match full seconds (EDF records)
-        remainder = n_samples % block_size
-        if remainder > 0:
-            pad_len = block_size - remainder
-            # Pad with the last value to avoid artifacts
-            padding = np.full(pad_len, data[-1])
-            data = np.concatenate([data, padding])
-            print(f"Padded data with {pad_len} samples to match 1-second blocks.")
+        # ECG Channel
+        ch1 = {'label': 'ECG', 'dimension': 'uV', 'sample_frequency': fs, 'physical_max': physical_max, 'physical_min': physical_min, 'digital_max': 32767, 'digital_min': -32768, 'transducer': 'AgAgCl', 'prefilter': ''}
+        channel_info = [ch1]
+
+        n_samples = offset
+        # np.memmap cannot map an empty file
+        data = np.memmap(spool_path, dtype=np.float64, mode='r') if n_samples else np.empty(0)
+
+        try:
+            f = pyedflib.EdfWriter(output_file, n_channels, file_type=pyedflib.FILETYPE_EDFPLUS)
+            f.setSignalHeaders(channel_info)
             
-        # Write blocks
-        for i in range(0, len(data), block_size):
-            chunk = data[i:i+block_size]
-            f.writePhysicalSamples(chunk)
-        
-        for onset, duration, desc in annotations:
-            f.writeAnnotation(onset, duration, desc)
+            # Second pass: write data in 1-second blocks (fs samples) to ensure
+            # correct EDF structure. A writer thread consumes chunk-sized
+            # windows of the mapped signal so that paging in the next window
+            # overlaps with writing the records of the current one.
+            n_full = n_samples - n_samples % block_size
+            windows = queue.Queue(maxsize=4)
+            errors = []
+
+            def write_windows():
+                while True:
+                    window = windows.get()
+                    if window is None:
+                        break
+                    # Keep draining after an error so the producer never blocks
+                    if not errors:
+                        try:
+                            for j in range(0, len(window), block_size):
+                                f.writePhysicalSamples(window[j:j+block_size])
+                        except Exception as e:
+                            errors.append(e)
+
+            writer = threading.Thread(target=write_windows, daemon=True)
+            writer.start()
+            try:
+                for i in range(0, n_full, chunksize):
+                    windows.put(np.array(data[i:min(i+chunksize, n_full)]))
+            finally:
+                windows.put(None)
+                writer.join()
+            if errors:
+                raise errors[0]
             
-        f.close()
+            # Pad the last block if necessary to match full seconds (EDF records)
+            if n_full < n_samples:
+                pad_len = block_size - (n_samples - n_full)
+                # Pad with the last value to avoid artifacts, filling one
+                # preallocated record instead of concatenating a padding array
+                record = np.empty(block_size, dtype=np.float64)
+                record[:n_samples - n_full] = data[n_full:]
+                record[n_samples - n_full:] = data[-1]
+                f.writePhysicalSamples(record)
+                print(f"Padded data with {pad_len} samples to match 1-second blocks.")
+            
+            for onset, duration, desc in annotations:
+                f.writeAnnotation(onset, duration, desc)
+                
+            f.close()
 
-        print(f"Saved to {output_file}")
-        print("INSTRUCTIONS FOR KUBIOS (EDF):")
-        print("1. Open Kubios HRV.")
-        print("2. Open the .edf file.")
-        print("3. Kubios should auto-detect Sampling Rate and Markers (Annotations).")
-        
-    except Exception as e:
-        print(f"Error writing EDF: {e}")
+            print(f"Saved to {output_file}")
+            print("INSTRUCTIONS FOR KUBIOS (EDF):")
+            print("1. Open Kubios HRV.")
+            print("2. Open the .edf file.")
+            print("3. Kubios should auto-detect Sampling Rate and Markers (Annotations).")
+            
+        except Exception as e:
+            print(f"Error writing EDF: {e}")
+        finally:
+            # Release the mapping so the spool file can be removed (Windows)
+            del data
 
 
 def export_to_mat(df, output_file, fs, ecg_col, marker_col):
@@ -171,7 +265,8 @@ def export_to_kubios(bids_tsv, output_file=None, fmt="dat"):
 
     print(f"Reading {bids_tsv}...")
     try:
-        df = pd.read_csv(bids_tsv, sep='\t', compression='gzip' if bids_tsv.endswith('.gz') else None)
+        # Only the header is read here; samples are streamed per export format
+        columns = read_columns(bids_tsv)
     except Exception as e:
         print(f"Error reading file: {e}")
         return
@@ -191,11 +286,11 @@ def export_to_kubios(bids_tsv, output_file=None, fmt="dat"):
     else:
         print(f"Sampling Frequency: {fs} Hz")
 
-    print("Available columns:", df.columns.tolist())
+    print("Available columns:", columns)
 
     # Try to auto-detect ECG and Marker
-    ecg_col = next((c for c in df.columns if "EKG" in c.upper() or "ECG" in c.upper()), None)
-    marker_col = next((c for c in df.columns if "MARKER" in c.upper() or "TRG" in c.upper()), None)
+    ecg_col = next((c for c in columns if "EKG" in c.upper() or "ECG" in c.upper()), None)
+    marker_col = next((c for c in columns if "MARKER" in c.upper() or "TRG" in c.upper()), None)
 
     if not ecg_col:
         print("Could not auto-detect ECG column.")
@@ -208,24 +303,27 @@ def export_to_kubios(bids_tsv, output_file=None, fmt="dat"):
     if marker_col and marker_col.strip() == "":
         marker_col = None
 
+    selected = [ecg_col] + ([marker_col] if marker_col else [])
+
     if fmt == "edf":
-        export_to_edf(df, output_file, fs, ecg_col, marker_col)
+        export_to_edf(bids_tsv, output_file, fs, ecg_col, marker_col)
     elif fmt == "mat":
+        # MAT files are written in one piece, so the selected columns are loaded fully
+        df = pd.read_csv(bids_tsv, sep='\t', compression=_compression(bids_tsv), usecols=selected)
         export_to_mat(df, output_file, fs, ecg_col, marker_col)
     else:
         # ASCII Export
-        # Prepare output DataFrame
-        out_df = pd.DataFrame()
-        out_df[ecg_col] = df[ecg_col]
-        
         if marker_col:
-            out_df[marker_col] = df[marker_col]
             print(f"Exporting ECG ({ecg_col}) and Marker ({marker_col})...")
         else:
             print(f"Exporting ECG ({ecg_col}) only...")
 
-        # Save as space-separated or comma-separated
-        out_df.to_csv(output_file, sep=',', index=False, header=False)
+        # Column types (and so the number formatting) are inferred over the
+        # whole file, so the selected columns are read in one piece
+        df = pd.read_csv(bids_tsv, sep='\t', compression=_compression(bids_tsv), usecols=selected)
+
+        # Save as comma-separated
+        df[selected].to_csv(output_file, sep=',', index=False, header=False)
         
         print(f"Saved to {output_file}")
         print("-" * 40)
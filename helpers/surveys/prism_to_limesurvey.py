@@ -14,66 +14,148 @@ import os
 import json
 import argparse
 import zipfile
-import io
-import xml.etree.ElementTree as ET
+from itertools import groupby
+from operator import itemgetter
+from xml.sax.saxutils import escape
 from datetime import datetime
 
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+except ImportError:
+    IJSON_AVAILABLE = False
+
 
 def create_cdata(text):
     """Helper to create CDATA-like text (LimeSurvey uses HTML entities often)"""
     return text if text else ""
 
 
-def add_row(parent, data):
-    """Add a <row> element with child tags based on dictionary"""
-    row = ET.SubElement(parent, "row")
-    for key, value in data.items():
-        child = ET.SubElement(row, key)
-        # CDATA handling is tricky in ElementTree, we'll just set text
-        # LimeSurvey is usually fine with standard XML escaping
-        child.text = str(value)
+def add_row(rows, data):
+    """Queue a <row> with child tags based on dictionary for a section"""
+    rows.append(data)
 
 
-def json_to_lss(json_path, output_path, matrix_mode=False):
-    with open(json_path, "r") as f:
-        data = json.load(f)
+_ROW_TEMPLATES = {}
+
+
+def _row_template(keys):
+    """Return the cached format string for a <row> with the given child tags"""
+    template = _ROW_TEMPLATES.get(keys)
+    if template is None:
+        template = (
+            "\n      <row>"
+            + "".join(f"\n        <{key}>{{}}</{key}>" for key in keys)
+            + "\n      </row>"
+        )
+        _ROW_TEMPLATES[keys] = template
+    return template
+
+
+def write_lss(out, sections):
+    """
+    Stream the LSS document to the binary file object `out`.
+
+    `sections` is a list of (tag, rows) pairs in document order. Rows are
+    rendered through one precompiled template per tag set and each section
+    is written as it is rendered, so no element tree is built in memory.
+    """
+    out.write(
+        b"<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n"
+        b"<document>\n"
+        b"  <LimeSurveyDocType>Survey</LimeSurveyDocType>\n"
+        b"  <DBVersion>366</DBVersion>\n"  # Approximate version
+        b"  <languages>\n"
+        b"    <language>en</language>\n"
+        b"  </languages>"
+    )
+
+    for tag, rows in sections:
+        parts = [f"\n  <{tag}>"]
+        if rows:
+            parts.append("\n    <rows>")
+            for data in rows:
+                # LimeSurvey is usually fine with standard XML escaping.
+                # Most values are already strings, only convert the others.
+                parts.append(
+                    _row_template(tuple(data)).format(
+                        *[
+                            escape(value if type(value) is str else str(value))
+                            for value in data.values()
+                        ]
+                    )
+                )
+            parts.append("\n    </rows>")
+        else:
+            parts.append("\n    <rows/>")
+        parts.append(f"\n  </{tag}>")
+        out.write("".join(parts).encode("utf-8"))
+
+    out.write(b"\n</document>")
+
 
-    # Filter out metadata keys
-    questions = {
-        k: v
-        for k, v in data.items()
-        if k not in ["Technical", "Study", "Metadata", "Categories", "TaskName"]
-    }
+METADATA_KEYS = frozenset(["Technical", "Study", "Metadata", "Categories", "TaskName"])
+
+
+def _levels_key(levels):
+    """Order-independent key for comparing Levels dicts (None if empty)"""
+    if not levels:
+        return None
+    try:
+        return frozenset(levels.items())
+    except TypeError:
+        # Unhashable labels (e.g. per-language dicts)
+        return json.dumps(levels, sort_keys=True)
+
+
+def iter_sidecar(json_path):
+    """
+    Yield the top-level (key, value) pairs of a JSON sidecar.
+
+    With ijson installed the file is parsed incrementally, one entry at a
+    time; otherwise it is loaded in one go.
+    """
+    with open(json_path, "rb") as f:
+        if IJSON_AVAILABLE:
+            yield from ijson.kvitems(f, "", use_float=True)
+        else:
+            yield from json_loads(f.read()).items()
+
+
+def json_to_lss(json_path, output_path, matrix_mode=False):
+    # Split metadata from questions while reading, skipping non-question
+    # entries and looking up each question's Levels once for both grouping modes
+    data = {}
+    questions = []
+    for k, v in iter_sidecar(json_path):
+        if k in METADATA_KEYS:
+            data[k] = v
+        elif isinstance(v, dict):
+            questions.append((k, v, v.get("Levels") or {}))
 
     # IDs
     sid = "123456"  # Dummy Survey ID
     gid = "10"  # Dummy Group ID
 
-    # Root element
-    root = ET.Element("document")
-    ET.SubElement(root, "LimeSurveyDocType").text = "Survey"
-    ET.SubElement(root, "DBVersion").text = "366"  # Approximate version
-
-    # Languages
-    langs = ET.SubElement(root, "languages")
-    ET.SubElement(langs, "language").text = "en"
-
+    # Rows per section, serialized by write_lss at the end
     # 1. ANSWERS Section (Collect all unique answer sets to generate IDs)
     # We need to generate answer entries for questions with 'Levels'
-    answers_elem = ET.SubElement(root, "answers")
-    answers_rows = ET.SubElement(answers_elem, "rows")
+    answers_rows = []
 
     # 2. QUESTIONS Section
-    questions_elem = ET.SubElement(root, "questions")
-    questions_rows = ET.SubElement(questions_elem, "rows")
+    questions_rows = []
 
     # 3. GROUPS Section
-    groups_elem = ET.SubElement(root, "groups")
-    groups_rows = ET.SubElement(groups_elem, "rows")
+    groups_rows = []
 
     # 4. SUBQUESTIONS Section
-    subquestions_elem = ET.SubElement(root, "subquestions")
-    subquestions_rows = ET.SubElement(subquestions_elem, "rows")
+    subquestions_rows = []
 
     # Add the single group
     add_row(
@@ -93,49 +175,30 @@ def json_to_lss(json_path, output_path, matrix_mode=False):
     # Prepare Groups of Questions
     grouped_questions = []
     if matrix_mode:
-        current_group = []
-        last_levels_str = None
+        # Compute a comparable Levels key once per question, then group runs
+        # of consecutive questions sharing the same key
+        keys = [_levels_key(levels) for _, _, levels in questions]
 
-        for q_code, q_data in questions.items():
-            if not isinstance(q_data, dict):
-                continue
-
-            levels = q_data.get("Levels", {})
+        for levels_key, run in groupby(zip(keys, questions), key=itemgetter(0)):
+            run = [question for _, question in run]
             # Only group if levels exist. Text questions shouldn't be grouped this way usually.
-            levels_str = json.dumps(levels, sort_keys=True) if levels else "NO_LEVELS"
-
-            if not current_group:
-                current_group.append((q_code, q_data))
-                last_levels_str = levels_str
+            if levels_key is None:
+                grouped_questions.extend([item] for item in run)
             else:
-                # Check if matches previous
-                if levels and levels_str == last_levels_str:
-                    current_group.append((q_code, q_data))
-                else:
-                    # Flush current group
-                    grouped_questions.append(current_group)
-                    # Start new
-                    current_group = [(q_code, q_data)]
-                    last_levels_str = levels_str
-
-        if current_group:
-            grouped_questions.append(current_group)
+                grouped_questions.append(run)
     else:
         # No grouping
-        for q_code, q_data in questions.items():
-            if isinstance(q_data, dict):
-                grouped_questions.append([(q_code, q_data)])
+        grouped_questions = [[question] for question in questions]
 
     # Process Questions
     qid_counter = 100
     sort_order = 0
 
     for group in grouped_questions:
-        # group is a list of (q_code, q_data)
+        # group is a list of (q_code, q_data, levels)
 
         # Common data from first item
-        first_code, first_data = group[0]
-        levels = first_data.get("Levels", {})
+        first_code, first_data, levels = group[0]
 
         # Determine if it's a Matrix or Single
         is_matrix = (len(group) > 1)
@@ -185,7 +248,7 @@ def json_to_lss(json_path, output_path, matrix_mode=False):
 
             # Add Subquestions
             sub_sort = 0
-            for code, data_item in group:
+            for code, data_item, _ in group:
                 sub_sort += 1
                 sub_qid = str(qid_counter)
                 qid_counter += 1
@@ -277,8 +340,7 @@ def json_to_lss(json_path, output_path, matrix_mode=False):
                     )
 
     # 5. SURVEYS Section (General Settings)
-    surveys_elem = ET.SubElement(root, "surveys")
-    surveys_rows = ET.SubElement(surveys_elem, "rows")
+    surveys_rows = []
 
     add_row(
         surveys_rows,
@@ -296,8 +358,7 @@ def json_to_lss(json_path, output_path, matrix_mode=False):
     )
 
     # 6. SURVEY_LANGUAGESETTINGS (Title, etc.)
-    surveys_lang_elem = ET.SubElement(root, "surveys_languagesettings")
-    surveys_lang_rows = ET.SubElement(surveys_lang_elem, "rows")
+    surveys_lang_rows = []
 
     add_row(
         surveys_lang_rows,
@@ -312,8 +373,7 @@ def json_to_lss(json_path, output_path, matrix_mode=False):
     )
 
     # 7. THEMES (Required for LS 3+)
-    themes_elem = ET.SubElement(root, "themes")
-    themes_rows = ET.SubElement(themes_elem, "rows")
+    themes_rows = []
 
     add_row(
         themes_rows,
@@ -325,8 +385,7 @@ def json_to_lss(json_path, output_path, matrix_mode=False):
     )
 
     # 8. THEMES_INHERITED (Required for LS 3+)
-    themes_inh_elem = ET.SubElement(root, "themes_inherited")
-    themes_inh_rows = ET.SubElement(themes_inh_elem, "rows")
+    themes_inh_rows = []
 
     add_row(
         themes_inh_rows,
@@ -337,31 +396,35 @@ def json_to_lss(json_path, output_path, matrix_mode=False):
         },
     )
 
-    # Write to file
-    tree = ET.ElementTree(root)
-    # Indent for readability (Python 3.9+)
-    if hasattr(ET, "indent"):
-        ET.indent(tree, space="  ", level=0)
+    sections = [
+        ("answers", answers_rows),
+        ("questions", questions_rows),
+        ("groups", groups_rows),
+        ("subquestions", subquestions_rows),
+        ("surveys", surveys_rows),
+        ("surveys_languagesettings", surveys_lang_rows),
+        ("themes", themes_rows),
+        ("themes_inherited", themes_inh_rows),
+    ]
 
     if output_path.endswith('.lsa'):
         # Create LSA archive (Zip file containing .lss)
-        # We need to write the XML to a buffer first
-        xml_buffer = io.BytesIO()
-        tree.write(xml_buffer, encoding="UTF-8", xml_declaration=True)
-        xml_content = xml_buffer.getvalue()
-        
         with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as z:
             # The .lss file inside the archive usually has the same name as the archive or 'survey_archive.lss'
             lss_filename = os.path.basename(output_path).replace('.lsa', '.lss')
-            z.writestr(lss_filename, xml_content)
+            info = zipfile.ZipInfo(lss_filename, date_time=datetime.now().timetuple()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            # Stream the XML straight into the compressed entry
+            with z.open(info, 'w') as entry:
+                write_lss(entry, sections)
             
         print(f"Successfully created LSA archive {output_path}")
     else:
         # Standard LSS file
-        tree.write(output_path, encoding="UTF-8", xml_declaration=True)
+        with open(output_path, "wb") as out:
+            write_lss(out, sections)
         print(f"Successfully created {output_path}")
 
-
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description="Convert Prism/BIDS JSON sidecar to LimeSurvey Structure File (.lss) or Archive (.lsa)."
@@ -8,6 +8,7 @@ A modular, BIDS-inspired validation tool for psychological research datasets.
 import os
 import sys
 import argparse
+import multiprocessing
 
 # Check if running inside the venv (skip for frozen/packaged apps)
 venv_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".venv")
@@ -85,6 +86,14 @@ Examples:
         action="store_true",
         help="Show warnings from the BIDS validator (default: hidden)",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Number of processes used to validate subjects in large datasets "
+        "(default: 1; 0 = one per CPU)",
+    )
     parser.add_argument("--version", action="version", version="Prism-Validator 1.3.0")
 
     args = parser.parse_args()
@@ -128,6 +137,7 @@ Examples:
             verbose=args.verbose,
             schema_version=schema_version,
             run_bids=args.bids,
+            workers=args.workers or None,
         )
 
         # Print results
@@ -148,4 +158,6 @@ Examples:
 
 
 if __name__ == "__main__":
+    # Subject validation uses worker processes; needed for frozen builds
+    multiprocessing.freeze_support()
     main()
@@ -5,6 +5,8 @@ import os
 import shutil
 from pathlib import Path
 import glob
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 # Enforce running from the repo-local virtual environment (skip for frozen/packaged apps)
 venv_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".venv")
@@ -30,35 +32,44 @@ from scripts.limesurvey_to_prism import convert_lsa_to_prism, batch_convert_lsa
 # We need to import from scripts.excel_to_library
 from scripts.excel_to_library import process_excel
 
+_ID_TRANSLATION = str.maketrans({
+    'ä': 'ae', 'ö': 'oe', 'ü': 'ue',
+    'Ä': 'Ae', 'Ö': 'Oe', 'Ü': 'Ue',
+    'ß': 'ss'
+})
+
 def sanitize_id(id_str):
     """
     Sanitizes subject/session IDs by replacing German umlauts and special characters.
     """
     if not id_str:
         return id_str
-    replacements = {
-        'ä': 'ae', 'ö': 'oe', 'ü': 'ue',
-        'Ä': 'Ae', 'Ö': 'Oe', 'Ü': 'Ue',
-        'ß': 'ss'
-    }
-    for char, repl in replacements.items():
-        id_str = id_str.replace(char, repl)
-    return id_str
+    return id_str.translate(_ID_TRANSLATION)
 
 import json
 import hashlib
+import re
+
+# sub-/ses- labels at the start of a filename part or of a folder name
+_STEM_ENTITY_RE = re.compile(r"(?<![^_])(sub|ses)-[^_]*")
+_DIR_ENTITY_RE = re.compile(r"(?<![^/\\])(sub|ses)-[^/\\]*")
+
+def get_json_hash(json_path, raw=None):
+    """
+    Calculates hash of a JSON file's semantic content.
 
-def get_json_hash(json_path):
-    """Calculates hash of a JSON file's semantic content."""
+    raw may hold the file's bytes if they were already read.
+    """
+    if raw is None:
+        with open(json_path, "rb") as f:
+            raw = f.read()
     try:
-        with open(json_path, "r", encoding="utf-8") as f:
-            obj = json.load(f)
+        obj = json.loads(raw)
         canonical = json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
-        return hashlib.md5(canonical.encode("utf-8")).hexdigest()
+        return hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).digest()
     except Exception:
         # Fallback: raw bytes hash
-        with open(json_path, "rb") as f:
-            return hashlib.md5(f.read()).hexdigest()
+        return hashlib.blake2b(raw, digest_size=16).digest()
 
 def consolidate_sidecars(output_dir, task, suffix):
     """
@@ -75,11 +86,26 @@ def consolidate_sidecars(output_dir, task, suffix):
         return
 
     first_json = json_files[0]
-    first_hash = get_json_hash(first_json)
+    first_bytes = first_json.read_bytes()
+    first_hash = None
+    
+    # Peers whose size differs from the first sidecar are checked first: they
+    # are the likely mismatches, so a differing set usually stops after
+    # reading a single peer. Size alone is not decisive, since formatting
+    # may differ while the content is the same.
+    first_size = len(first_bytes)
+    peers = sorted(json_files[1:], key=lambda jf: jf.stat().st_size == first_size)
     
     all_identical = True
-    for jf in json_files[1:]:
-        if get_json_hash(jf) != first_hash:
+    for jf in peers:
+        peer_bytes = jf.read_bytes()
+        # Byte-identical files are identical; the comparison exits at the
+        # first differing byte. Only differing bytes need the semantic hash.
+        if peer_bytes == first_bytes:
+            continue
+        if first_hash is None:
+            first_hash = get_json_hash(first_json, first_bytes)
+        if get_json_hash(jf, peer_bytes) != first_hash:
             all_identical = False
             break
     
@@ -89,8 +115,8 @@ def consolidate_sidecars(output_dir, task, suffix):
         root_json_name = f"task-{task}_{suffix}.json"
         root_json_path = output_dir / root_json_name
         
-        # Copy first json to root
-        shutil.copy(first_json, root_json_path)
+        # Write first json to root from the bytes already read
+        root_json_path.write_bytes(first_bytes)
         print(f"Created root sidecar: {root_json_path}")
         
         # Delete individual sidecars
@@ -100,6 +126,52 @@ def consolidate_sidecars(output_dir, task, suffix):
     else:
         print("Sidecars differ. Keeping individual files.")
 
+def iter_raw_files(root):
+    """
+    Yields paths of all *.raw files (any case) below root.
+
+    Walks the tree with os.scandir so file types come from the directory
+    listing itself instead of a stat() per entry.
+    """
+    stack = [root]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name[-4:].lower() == ".raw":
+                    yield entry.path
+
+def _convert_one(raw_path, edf_path, json_path, task, sampling_rate):
+    """
+    Converts a single Varioport file; runs in a worker process.
+
+    Returns (success, message) for the caller to report.
+    """
+    out_edf = Path(edf_path)
+    try:
+        convert_varioport(
+            raw_path,
+            edf_path,
+            json_path,
+            task_name=task,
+            base_freq=sampling_rate
+        )
+    except Exception as e:
+        return False, f"Error converting {Path(raw_path).name}: {e}"
+    
+    # Check file size
+    if not out_edf.exists():
+        return False, f"❌ Error: Output file was not created: {out_edf}"
+    size_kb = out_edf.stat().st_size / 1024
+    if size_kb < 10: # Warn if smaller than 10KB
+        return True, f"⚠️  WARNING: Output file is suspiciously small ({size_kb:.2f} KB): {out_edf}"
+    return True, f"✅ Created {out_edf.name} ({size_kb:.2f} KB)"
+
 def cmd_convert_physio(args):
     """
     Handles the 'convert physio' command.
@@ -117,10 +189,8 @@ def cmd_convert_physio(args):
     # We search recursively for the raw files
     # The pattern should be flexible but ideally match the BIDS-like structure
     
-    # Find all files matching the pattern
-    # We assume files end with .raw or .RAW (case insensitive check later if needed)
-    # But glob is case sensitive on Linux.
-    files = list(input_dir.rglob("*.[rR][aA][wW]"))
+    # Find all files ending with .raw (case insensitive)
+    files = [Path(p) for p in iter_raw_files(str(input_dir))]
     
     if not files:
         print("No .raw files found in input directory.")
@@ -130,35 +200,25 @@ def cmd_convert_physio(args):
     
     success_count = 0
     error_count = 0
+    made_dirs = set()
+    jobs = []
     
     for raw_file in files:
         # Infer subject and session from path or filename
         # Expected filename: sub-<id>_ses-<id>_physio.raw
         filename = raw_file.name
         
-        # Simple parsing logic
-        parts = raw_file.stem.split('_')
-        sub_id = None
-        ses_id = None
-        
-        for part in parts:
-            if part.startswith('sub-'):
-                sub_id = part
-            elif part.startswith('ses-'):
-                ses_id = part
+        # Simple parsing logic; the last match in the filename wins
+        ids = {m.group(1): m.group(0) for m in _STEM_ENTITY_RE.finditer(raw_file.stem)}
         
         # Fallback: try to get from parent folders if not in filename
-        if not sub_id:
-            for parent in raw_file.parents:
-                if parent.name.startswith('sub-'):
-                    sub_id = parent.name
-                    break
+        # (the nearest folder, i.e. the last match in the path, wins)
+        if len(ids) < 2:
+            for m in reversed(list(_DIR_ENTITY_RE.finditer(str(raw_file.parent)))):
+                ids.setdefault(m.group(1), m.group(0))
         
-        if not ses_id:
-            for parent in raw_file.parents:
-                if parent.name.startswith('ses-'):
-                    ses_id = parent.name
-                    break
+        sub_id = ids.get("sub")
+        ses_id = ids.get("ses")
         
         if not sub_id or not ses_id:
             print(f"Skipping {filename}: Could not determine subject or session ID.")
@@ -171,7 +231,9 @@ def cmd_convert_physio(args):
         # Construct output path
         # rawdata/sub-XXX/ses-YYY/physio/
         target_dir = output_dir / sub_id / ses_id / "physio"
-        target_dir.mkdir(parents=True, exist_ok=True)
+        if target_dir not in made_dirs:
+            target_dir.mkdir(parents=True, exist_ok=True)
+            made_dirs.add(target_dir)
         
         # Construct output filename
         # sub-XXX_ses-YYY_task-<task>_<suffix>.edf
@@ -180,32 +242,23 @@ def cmd_convert_physio(args):
         out_json = target_dir / f"{out_base}.json"
         
         print(f"Converting {filename} -> {out_base}.edf")
-        
-        try:
-            convert_varioport(
-                str(raw_file),
-                str(out_edf),
-                str(out_json),
-                task_name=args.task,
-                base_freq=args.sampling_rate
-            )
-            
-            # Check file size
-            if out_edf.exists():
-                size_kb = out_edf.stat().st_size / 1024
-                if size_kb < 10: # Warn if smaller than 10KB
-                    print(f"⚠️  WARNING: Output file is suspiciously small ({size_kb:.2f} KB): {out_edf}")
+        jobs.append((str(raw_file), str(out_edf), str(out_json)))
+    
+    # Files are independent and decoding is CPU-bound, so convert them in
+    # parallel worker processes
+    if jobs:
+        with ProcessPoolExecutor(max_workers=min(len(jobs), os.cpu_count() or 1)) as executor:
+            futures = [
+                executor.submit(_convert_one, raw_path, edf_path, json_path, args.task, args.sampling_rate)
+                for raw_path, edf_path, json_path in jobs
+            ]
+            for future in as_completed(futures):
+                ok, msg = future.result()
+                print(msg)
+                if ok:
+                    success_count += 1
                 else:
-                    print(f"✅ Created {out_edf.name} ({size_kb:.2f} KB)")
-            else:
-                 print(f"❌ Error: Output file was not created: {out_edf}")
-                 error_count += 1
-                 continue
-
-            success_count += 1
-        except Exception as e:
-            print(f"Error converting {filename}: {e}")
-            error_count += 1
+                    error_count += 1
             
     # Consolidate sidecars if requested (or always?)
     # BIDS inheritance principle
@@ -299,6 +352,7 @@ def cmd_survey_import_limesurvey_batch(args):
             task_fallback=args.task,
             id_column=args.subject_id_col,
             id_map_file=args.id_map,
+            workers=args.workers,
         )
     except Exception as e:
         print(f"Error importing LimeSurvey: {e}")
@@ -376,6 +430,11 @@ def main():
         dest="id_map",
         help="Path to TSV/CSV file mapping LimeSurvey IDs to BIDS participant IDs (cols: limesurvey_id, participant_id)",
     )
+    parser_survey_limesurvey_batch.add_argument(
+        "--workers",
+        type=int,
+        help="Number of processes used to parse the archives (default: one per CPU)",
+    )
 
     args = parser.parse_args()
     
@@ -398,4 +457,6 @@ def main():
         parser.print_help()
 
 if __name__ == "__main__":
+    # Physio conversion uses worker processes; needed for frozen builds
+    multiprocessing.freeze_support()
     main()
@@ -3,6 +3,7 @@ import os
 import sys
 import shutil
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 
 # Clean previous builds
 if os.path.exists('build'):
@@ -23,18 +24,24 @@ if sys.platform == 'darwin':
             shutil.rmtree(iconset_dir)
         os.makedirs(iconset_dir)
 
-        # Generate required sizes
+        # Generate required sizes (normal and retina 2x resolution)
         sizes = [16, 32, 64, 128, 256, 512, 1024]
+        tasks = []
         for size in sizes:
-            # Normal resolution
-            subprocess.run(['sips', '-z', str(size), str(size), source_png, 
-                          '--out', f"{iconset_dir}/icon_{size}x{size}.png"], 
-                          check=True, capture_output=True)
-            # Retina resolution (2x)
-            subprocess.run(['sips', '-z', str(size*2), str(size*2), source_png, 
-                          '--out', f"{iconset_dir}/icon_{size}x{size}@2x.png"], 
+            tasks.append((size, f"{iconset_dir}/icon_{size}x{size}.png"))
+            tasks.append((size*2, f"{iconset_dir}/icon_{size}x{size}@2x.png"))
+
+        def resize(task):
+            pixels, out_name = task
+            subprocess.run(['sips', '-z', str(pixels), str(pixels), source_png, 
+                          '--out', out_name], 
                           check=True, capture_output=True)
 
+        # The sips calls are independent; threads suffice since each one
+        # just waits on its subprocess
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            list(executor.map(resize, tasks))
+
         # Convert to icns
         subprocess.run(['iconutil', '-c', 'icns', iconset_dir], check=True)
         icon_file = "PrismValidator.icns"
@@ -78,17 +85,25 @@ else:
     print("⚠️ survey_library not found, skipping (optional)")
 
 
+# Pass --onedir for a folder build: it starts faster because nothing has to
+# be extracted to a temp directory on launch. Releases use a single file.
+onedir = '--onedir' in sys.argv[1:]
+
 # Run PyInstaller
 args = [
     'prism-validator-web.py',
     '--name=PrismValidator',
     '--windowed',  # No console window
-    '--onefile',   # Single executable file
+    '--onedir' if onedir else '--onefile',
     '--clean',
     '--noconfirm',
     # Explicitly include hidden imports that PyInstaller might miss
     '--hidden-import=jsonschema',
     '--hidden-import=xml.etree.ElementTree',
+    # Test suites of scientific packages are never needed at runtime
+    '--exclude-module=numpy.tests',
+    '--exclude-module=pandas.tests',
+    '--exclude-module=matplotlib.tests',
 ]
 
 # Add macOS-specific options
@@ -96,8 +111,15 @@ if sys.platform == 'darwin':
     args.extend([
         # Add Info.plist keys to fix "prohibited" sign and improve integration
         '--osx-bundle-identifier=at.ac.uni-graz.mri.prism-validator',
+        # The folder picker uses osascript on macOS, Tkinter is not needed
+        '--exclude-module=tkinter',
     ])
 
+if sys.platform.startswith('linux'):
+    # Drop debug symbols from the bundled binaries. Not on macOS, where
+    # stripping conflicts with the code signatures of the bundled binaries.
+    args.append('--strip')
+
 if icon_file:
     args.append(f'--icon={icon_file}')
 
@@ -123,6 +145,7 @@ if sys.platform == 'darwin':
         print(f"⚠️ Updating Info.plist failed: {e}")
 
     # 2. Force ad-hoc code signing
+    # Info.plist must be final before this step, so it stays after plutil.
     try:
         print("🔏 Signing app bundle...")
         subprocess.run(['codesign', '--force', '--deep', '--sign', '-', app_path], check=True)
@@ -1,25 +1,44 @@
+import numpy as np
 import pandas as pd
+import csv
 import json
 import os
 import sys
 import argparse
 
+try:
+    import orjson
+
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+
+def json_dumps(obj):
+    # Sidecars keep json.dump's layout: 2-space indent, non-ASCII escaped
+    return json.dumps(obj, indent=2).encode("ascii")
+
 
 def load_schemas(library_path):
     """Load all survey JSONs from the library."""
     schemas = {}
-    if not os.path.exists(library_path):
+    try:
+        entries = os.scandir(library_path)
+    except FileNotFoundError:
         print(f"Warning: Library path {library_path} does not exist.")
         return schemas
 
-    for f in os.listdir(library_path):
-        if f.endswith(".json") and f.startswith("survey-"):
-            # Extract task name: survey-ads.json -> ads
-            task_name = f.replace("survey-", "").replace(".json", "")
-            with open(os.path.join(library_path, f), "r") as jf:
+    with entries:
+        for entry in entries:
+            f = entry.name
+            if f.endswith(".json") and f.startswith("survey-"):
+                # Extract task name: survey-ads.json -> ads
+                task_name = f[7:-5]
+                with open(entry.path, "rb") as jf:
+                    raw = jf.read()
                 try:
-                    schemas[task_name] = json.load(jf)
-                except json.JSONDecodeError:
+                    schemas[task_name] = json_loads(raw)
+                except ValueError:
                     print(f"Error decoding {f}, skipping.")
     return schemas
 
@@ -51,17 +70,47 @@ def _allowed_values(col_def):
         except ValueError:
             numeric_levels = []
 
-        if numeric_levels:
-            min_level = min(numeric_levels)
-            max_level = max(numeric_levels)
-            full_range = [str(i) for i in range(min_level, max_level + 1)]
-            if set(full_range).issuperset(set(level_keys)):
-                return full_range
+        # Every key lies within [min, max], so the range covers the keys
+        # exactly when each key is already written as a plain integer
+        if numeric_levels and all(
+            k == str(n) for k, n in zip(level_keys, numeric_levels)
+        ):
+            return [str(i) for i in range(min(numeric_levels), max(numeric_levels) + 1)]
         return level_keys
 
     return None
 
 
+def _prefixed(series, prefix):
+    """
+    Return series as strings, adding prefix where it is missing (e.g. 'sub-').
+
+    Missing values are spelled as str() spells them ('nan', 'None'), so their
+    rows still get labels such as ses-nan instead of being left out.
+    """
+    values = series.astype(str)
+    missing = values.isna()
+    if missing.to_numpy().any():
+        values = values.where(~missing, series[missing].map(str))
+    return values.where(values.str.startswith(prefix), prefix + values)
+
+
+# Value types that csv.writer formats exactly like DataFrame.to_csv
+_PLAIN_TYPES = frozenset((str, int, float, bool))
+
+
+def _write_tsv_row(path, columns, row):
+    """Write a header plus one data row, as DataFrame([row]).to_csv(sep="\\t") would."""
+    if not all(type(v) in _PLAIN_TYPES for v in row):
+        # e.g. timestamps, which pandas formats itself
+        pd.DataFrame([row], columns=columns).to_csv(path, sep="\t", index=False)
+        return
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, delimiter="\t", lineterminator=os.linesep)
+        writer.writerow(columns)
+        writer.writerow(row)
+
+
 def _ensure_participants(df, id_col, output_root, library_path, candidates=None, participant_schema=None):
     """Create participants.tsv/json. Prefer explicit participant schema or library participants.json; otherwise infer."""
     rawdata_dir = os.path.join(output_root, "rawdata")
@@ -89,8 +138,8 @@ def _ensure_participants(df, id_col, output_root, library_path, candidates=None,
             part_schema[col] = {"Description": f"Participant attribute '{col}'"}
         inferred = True
     else:
-        with open(participants_json_path, "r") as f:
-            part_schema = json.load(f)
+        with open(participants_json_path, "rb") as f:
+            part_schema = json_loads(f.read())
 
     print("Generating participants.tsv using participant schema..." if (used_schema or not inferred) else "Generating inferred participants.tsv...")
     try:
@@ -104,18 +153,21 @@ def _ensure_participants(df, id_col, output_root, library_path, candidates=None,
         if found_part_vars:
             df_part = df.groupby(id_col)[found_part_vars].first().reset_index()
             df_part = df_part.rename(columns={id_col: "participant_id"})
-            df_part["participant_id"] = df_part["participant_id"].apply(
-                lambda x: f"sub-{x}" if not str(x).startswith("sub-") else str(x)
-            )
+            df_part["participant_id"] = _prefixed(df_part["participant_id"], "sub-")
 
             # Clean values against allowed values; fallback to 'n/a' when out of range/enum
+            allowed_sets = {}
+            for col in found_part_vars:
+                allowed = _allowed_values(part_schema.get(col, {}))
+                if allowed is not None:
+                    allowed_sets[col] = frozenset(allowed)
+
             for col in found_part_vars:
-                col_def = part_schema.get(col, {})
-                allowed = _allowed_values(col_def)
+                allowed = allowed_sets.get(col)
                 if allowed:
-                    df_part[col] = df_part[col].apply(
-                        lambda v: v if pd.isna(v) or str(v) in allowed else "n/a"
-                    )
+                    values = df_part[col]
+                    keep = values.isna() | values.astype(str).isin(allowed)
+                    df_part[col] = values.where(keep, "n/a")
 
             part_tsv_path = os.path.join(rawdata_dir, "participants.tsv")
             df_part.to_csv(part_tsv_path, sep="\t", index=False)
@@ -123,8 +175,8 @@ def _ensure_participants(df, id_col, output_root, library_path, candidates=None,
                 f"  - Created participants.tsv with {len(df_part)} subjects and {len(found_part_vars)} columns."
             )
 
-            with open(os.path.join(rawdata_dir, "participants.json"), "w") as f:
-                json.dump(part_schema, f, indent=2)
+            with open(os.path.join(rawdata_dir, "participants.json"), "wb") as f:
+                f.write(json_dumps(part_schema))
         else:
             if inferred:
                 print("  - No participant columns found to infer participants.tsv.")
@@ -150,6 +202,11 @@ def process_dataframe(df, schemas, output_root, library_path, session_override=N
     """Convert in-memory dataframe to BIDS TSV files based on JSON schemas."""
     rawdata_dir = os.path.join(output_root, "rawdata")
     os.makedirs(rawdata_dir, exist_ok=True)
+    # Subject/session folders are shared by all surveys; create each only once
+    made_dirs = {rawdata_dir}
+    # Output paths are built by plain concatenation in the row loop
+    rawdata_prefix = os.path.join(rawdata_dir, "")
+    sep = os.sep
 
     # Ensure dataset_description.json exists
     desc_path = os.path.join(rawdata_dir, "dataset_description.json")
@@ -166,8 +223,8 @@ def process_dataframe(df, schemas, output_root, library_path, session_override=N
             "ReferencesAndLinks": ["https://github.com/MRI-Lab-Graz/psycho-validator"],
             "DatasetDOI": ""
         }
-        with open(desc_path, "w") as f:
-            json.dump(dataset_description, f, indent=2)
+        with open(desc_path, "wb") as f:
+            f.write(json_dumps(dataset_description))
 
     id_cols = [
         c
@@ -214,6 +271,26 @@ def process_dataframe(df, schemas, output_root, library_path, session_override=N
 
     # Iterate over each defined survey schema
     GLOBAL_METADATA_COLS = ["startlanguage"]
+
+    # Normalize subject/session/run labels for all rows at once; these do not
+    # depend on the survey, so rows are also grouped by session/run only once
+    sub_ids = _prefixed(df[id_col], "sub-").to_numpy()
+    if "session" in df.columns:
+        base_sessions = _prefixed(df["session"], "ses-").to_numpy()
+    else:
+        base_sessions = np.full(len(df), session_override or "ses-1", dtype=object)
+    if "run" in df.columns:
+        base_runs = _prefixed(df["run"], "run-").to_numpy()
+    else:
+        base_runs = np.full(len(df), run_override or "run-1", dtype=object)
+
+    row_groups = []
+    grouped = pd.Series(np.arange(len(df))).groupby(
+        [base_sessions, base_runs], sort=False, dropna=False
+    )
+    for (base_ses, base_run), positions in grouped:
+        positions = positions.to_numpy()
+        row_groups.append((base_ses, base_run, positions, df.iloc[positions]))
     
     for task_name, schema in schemas.items():
         print(f"Processing survey: {task_name}...")
@@ -265,82 +342,91 @@ def process_dataframe(df, schemas, output_root, library_path, session_override=N
 
         print(f"  - Found {len(found_vars)} variables for {task_name}.")
         
+        # Allowed values per canonical column, computed once per survey
+        allowed_sets = {}
+        for k in canonical_order:
+            allowed = _allowed_values(schema.get(k, {}))
+            if allowed is not None:
+                allowed_sets[k] = frozenset(allowed)
+
         # Identify available global metadata columns
         available_meta_cols = [c for c in GLOBAL_METADATA_COLS if c in df.columns]
 
-        # 3. Create TSV for each participant, respecting per-variable session/run hints
-        for _, row in df.iterrows():
-            sub_id = str(row[id_col])
-
-            # Normalize subject ID (ensure sub- prefix)
-            if not sub_id.startswith("sub-"):
-                sub_id = f"sub-{sub_id}"
-
-            # Default session/run from row (if present) or fallback
-            base_ses = session_override or "ses-1"
-            if "session" in df.columns:
-                ses_val = str(row["session"])
-                base_ses = f"ses-{ses_val}" if not ses_val.startswith("ses-") else ses_val
+        # Partition variables by session/run hint once per survey; variables
+        # without a hint follow each row's session/run (the inherit sentinel)
+        inherit = object()
+        static_buckets = {}
+        for var in found_vars:
+            ses = var_session_hint.get(var, session_hint.get(var, inherit))
+            run = run_hint.get(var, inherit)
+            static_buckets.setdefault((ses, run), []).append(var)
+        var_position = {var: i for i, var in enumerate(found_vars)}
 
-            base_run = run_override or "run-1"
-            if "run" in df.columns:
-                run_val = str(row["run"])
-                base_run = f"run-{run_val}" if not run_val.startswith("run-") else run_val
+        # 3. Create TSV for each participant, respecting per-variable session/run hints
+        # Rows sharing the default session/run share the same partition of
+        # variables, so each partition is built and cleaned column-wise once
+        pending = []
+        for base_ses, base_run, positions, block in row_groups:
 
-            # Partition variables by session
+            # Fill the row's own session/run into the static partition; groups
+            # that end up with the same labels are merged in schema order
             buckets = {}
-            for var in found_vars:
-                ses = var_session_hint.get(var, session_hint.get(var, base_ses))
-                run = run_hint.get(var, base_run)
-                buckets.setdefault((ses, run), []).append(var)
-
-            for (ses_id, run_id), vars_in_bucket in buckets.items():
-                out_dir = os.path.join(rawdata_dir, sub_id, ses_id, "survey")
-                os.makedirs(out_dir, exist_ok=True)
-
-                row_data = row[vars_in_bucket].to_dict()
-
-                # Map to canonical keys and prefer first non-NaN if duplicates appear
-                merged = {}
-                for var, val in row_data.items():
-                    canon = canonical_for.get(var, var)
-                    if canon not in merged or (pd.isna(merged[canon]) and pd.notna(val)):
-                        merged[canon] = val
-
-                # Ensure columns follow canonical order
-                ordered_keys = [k for k in canonical_order if k in merged]
+            for (ses, run), group_vars in static_buckets.items():
+                key = (base_ses if ses is inherit else ses, base_run if run is inherit else run)
+                if key in buckets:
+                    buckets[key] = sorted(buckets[key] + group_vars, key=var_position.get)
+                else:
+                    buckets[key] = group_vars
+
+            for bucket_no, ((ses_id, run_id), vars_in_bucket) in enumerate(buckets.items()):
+                # Map to canonical keys (in canonical order) and prefer the
+                # first non-NaN value if duplicates appear
                 clean_data = {}
-                for k in ordered_keys:
-                    val = merged[k]
-                    if pd.isna(val):
-                        clean_data[k] = "n/a"
+                for k in canonical_order:
+                    sources = [v for v in vars_in_bucket if canonical_for.get(v, v) == k]
+                    if not sources:
                         continue
+                    # Object dtype keeps each value's own type (as in a row)
+                    values = block[sources[0]].astype(object)
+                    for var in sources[1:]:
+                        values = values.where(values.notna(), block[var].astype(object))
+
+                    invalid = values.isna()
+                    allowed = allowed_sets.get(k)
+                    if allowed:
+                        invalid |= ~values.astype(str).isin(allowed)
+                    clean_data[k] = values.where(~invalid, "n/a")
 
-                    col_def = schema.get(k, {})
-                    allowed = _allowed_values(col_def)
-                    if allowed and str(val) not in allowed:
-                        clean_data[k] = "n/a"
-                    else:
-                        clean_data[k] = val
-                
                 # Add global metadata columns
                 for meta_col in available_meta_cols:
-                    val = row[meta_col]
-                    if pd.notna(val):
-                        clean_data[meta_col] = val
-                    else:
-                        clean_data[meta_col] = "n/a"
+                    values = block[meta_col]
+                    clean_data[meta_col] = values.astype(object).where(values.notna(), "n/a")
 
-                df_task = pd.DataFrame([clean_data])
+                # Plain tuples per row, no per-row Series/DataFrame indexing
+                columns = list(clean_data)
+                rows = list(pd.DataFrame(clean_data).itertuples(index=False, name=None))
 
                 run_suffix = ""
                 if run_id and run_id != "run-1":
                     part = run_id.split("-", 1)[1] if "-" in run_id else run_id
                     run_suffix = f"_run-{part}"
-                tsv_name = f"{sub_id}_{ses_id}_survey-{task_name}{run_suffix}.tsv"
-                tsv_path = os.path.join(out_dir, tsv_name)
 
-                df_task.to_csv(tsv_path, sep="\t", index=False)
+                for pos, row in zip(positions, rows):
+                    sub_id = sub_ids[pos]
+                    out_dir = f"{rawdata_prefix}{sub_id}{sep}{ses_id}{sep}survey"
+                    tsv_name = f"{sub_id}_{ses_id}_survey-{task_name}{run_suffix}.tsv"
+                    pending.append((pos, bucket_no, out_dir, tsv_name, columns, row))
+
+        # Write in original row order; a later row for the same subject,
+        # session and run replaces an earlier one, so each file is written once
+        latest = {}
+        for pos, bucket_no, out_dir, tsv_name, columns, row in sorted(pending, key=lambda p: p[:2]):
+            latest[(out_dir, tsv_name)] = (columns, row)
+        for (out_dir, tsv_name), (columns, row) in latest.items():
+            if out_dir not in made_dirs:
+                os.makedirs(out_dir, exist_ok=True)
+                made_dirs.add(out_dir)
+            _write_tsv_row(f"{out_dir}{sep}{tsv_name}", columns, row)
 
         # 4. Ensure JSON sidecars exist in the root (BIDS inheritance)
         # PRISM uses survey-<task>.json.
@@ -353,8 +439,8 @@ def process_dataframe(df, schemas, output_root, library_path, session_override=N
 
         for path in [legacy_path]: #, bids_path):
             if not os.path.exists(path):
-                with open(path, "w") as f:
-                    json.dump(schema, f, indent=2)
+                with open(path, "wb") as f:
+                    f.write(json_dumps(schema))
 
     print("Conversion complete.")
 
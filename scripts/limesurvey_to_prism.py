@@ -1,28 +1,178 @@
 import argparse
+import io
 import json
 import os
 import re
 import sys
 import zipfile
-from datetime import datetime
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from functools import lru_cache
 from pathlib import Path
-import xml.etree.ElementTree as ET
 import pandas as pd
 
+try:
+    from lxml import etree as ET
+    LXML_AVAILABLE = True
+except ImportError:
+    import xml.etree.ElementTree as ET
+    LXML_AVAILABLE = False
+
+try:
+    import orjson
+
+    def json_dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+except ImportError:
+    def json_dumps(obj):
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+
 from scripts.csv_to_prism import load_schemas, process_dataframe
 
+# Read size for streamed XML; ZipExtFile otherwise hands the parser small
+# decompressed chunks
+_XML_READ_BUFFER = 1 << 20
+
+
+def _open_member(zf, name):
+    """Open an archive member as a buffered binary stream."""
+    return io.BufferedReader(zf.open(name), buffer_size=_XML_READ_BUFFER)
+
+
+def _parse_xml_file(fh):
+    """Parse an XML document from a binary file object, returning its root."""
+    return ET.parse(fh).getroot()
+
+
+def _iterparse(fh):
+    """Yield (event, element) pairs for start and end tags of a binary XML stream."""
+    return ET.iterparse(fh, events=("start", "end"))
+
+
+def _read_responses(fh):
+    """
+    Stream the fieldnames and response rows of a LimeSurvey .lsr document.
+
+    Returns (fieldnames, columns, n_rows). columns maps each row element's
+    tag (without the leading underscore) to one value per response, in order
+    of first appearance; responses missing an element get NaN there. Each
+    row is dropped from the tree once read, so memory does not grow with
+    the number of responses. The same goes for the fieldname elements.
+    """
+    nan = float("nan")
+    fieldnames = []
+    columns = {}
+    # Answer codes repeat across responses and questions; keep one string
+    # object per distinct value
+    shared_values = {}
+    n_rows = 0
+    path = []
+    for event, elem in _iterparse(fh):
+        if event == "start":
+            path.append(elem)
+            continue
+        path.pop()
+        if elem.tag == "fieldname":
+            fieldnames.append(elem.text or "")
+            path[-1].remove(elem)
+        elif (
+            elem.tag == "row"
+            and len(path) == 3
+            and path[1].tag == "responses"
+            and path[2].tag == "rows"
+        ):
+            for child in elem:
+                tag = child.tag.lstrip("_")
+                values = columns.get(tag)
+                if values is None:
+                    values = columns[tag] = [nan] * n_rows
+                else:
+                    # Pad skipped responses; a repeated element replaces the earlier one
+                    del values[n_rows:]
+                    values.extend([nan] * (n_rows - len(values)))
+                text = child.text
+                if text is not None:
+                    text = shared_values.setdefault(text, text)
+                values.append(text)
+            n_rows += 1
+            path[-1].remove(elem)
+
+    for values in columns.values():
+        values.extend([nan] * (n_rows - len(values)))
+    return fieldnames, columns, n_rows
+
+
+_SANITIZE_RE = re.compile(r"[^A-Za-z0-9]+")
+_HTML_TAG_RE = re.compile(r"<[^<]+?>")
+_ALPHA_PREFIX_RE = re.compile(r"([a-zA-Z]+)")
+
+
+def _read_lss_rows(fh, sections):
+    """
+    Stream the rows of the given top-level sections of a LimeSurvey .lss document.
+
+    Returns {section: [row, ...]}, each row mapping its field tags to their
+    text ("" when empty). Every row element is dropped from the tree once
+    read, and so is each top-level section once it ends, so memory does not
+    grow with the size of the survey.
+    """
+    rows = {section: [] for section in sections}
+    # Like Element.find, only the first section of each name is read
+    pending = set(sections)
+    path = []
+    for event, elem in _iterparse(fh):
+        if event == "start":
+            path.append(elem)
+            continue
+        path.pop()
+        if len(path) == 1:
+            pending.discard(elem.tag)
+            path[0].remove(elem)
+        elif elem.tag == "row" and len(path) > 1:
+            if len(path) == 3 and path[2].tag == "rows" and path[1].tag in pending:
+                fields = {}
+                for child in elem:
+                    # First of repeated fields wins, as with findtext
+                    fields.setdefault(child.tag, child.text or "")
+                rows[path[1].tag].append(fields)
+            path[-1].remove(elem)
+    return rows
+
+
+# Matches what str.isalnum() rejects (besides "_", which is kept as is)
+_NON_ALNUM_RE = re.compile(r"\W")
+
+
+def _safe_colname(title):
+    """Replace every non-alphanumeric character of title with "_"."""
+    return _NON_ALNUM_RE.sub("_", title)
+
+
 def sanitize_task_name(name):
     """Normalize task names for BIDS/PRISM filenames."""
-    cleaned = re.sub(r"[^A-Za-z0-9]+", "-", name.strip()).strip("-")
+    cleaned = _SANITIZE_RE.sub("-", name.strip()).strip("-")
     return cleaned.lower() or "survey"
 
 
-def _map_field_to_code(fieldname, qid_to_title):
-    m = re.match(r"(\d+)X(\d+)X(\d+)([A-Za-z0-9_]+)?", fieldname)
+_FIELD_RE = re.compile(r"(\d+)X(\d+)X(\d+)([A-Za-z0-9_]+)?")
+_TIMING_RE = re.compile(r"\d+X(\d+)time")
+
+
+@lru_cache(maxsize=None)
+def _split_fieldname(fieldname):
+    """Return (qid, suffix) of a SGQA fieldname (e.g. 123X4X56SQ001), or None."""
+    m = _FIELD_RE.match(fieldname)
     if not m:
+        return None
+    return m.group(3), m.group(4)
+
+
+def _map_field_to_code(fieldname, qid_to_title):
+    parts = _split_fieldname(fieldname)
+    if parts is None:
         return fieldname
-    qid = m.group(3)
-    suffix = m.group(4)
+    qid, suffix = parts
     if suffix:
         return suffix
     return qid_to_title.get(qid, fieldname)
@@ -30,48 +180,33 @@ def _map_field_to_code(fieldname, qid_to_title):
 
 def parse_lsa_responses(lsa_path):
     """Return (dataframe, qid->title mapping, groups_map) extracted from a LimeSurvey .lsa file."""
+    # Parse straight from the archive members instead of reading them into
+    # memory first
     with zipfile.ZipFile(lsa_path, "r") as z:
-        xml_resp = z.read(next(n for n in z.namelist() if n.endswith("_responses.lsr")))
-        xml_lss = z.read(next(n for n in z.namelist() if n.endswith(".lss")))
-
-    lss_root = ET.fromstring(xml_lss)
-    
-    # Helper to find text of a child element
-    def get_text(element, tag):
-        child = element.find(tag)
-        val = child.text if child is not None else ""
-        return val or ""
-
-    questions_map, groups_map = _parse_lss_structure(lss_root, get_text)
+        names = z.namelist()
+        resp_name = next(n for n in names if n.endswith("_responses.lsr"))
+        lss_name = next(n for n in names if n.endswith(".lss"))
+        with _open_member(z, resp_name) as fh:
+            fieldnames, columns, n_rows = _read_responses(fh)
+        # Only groups and (sub)questions are needed for the column names and
+        # timing groups
+        with _open_member(z, lss_name) as fh:
+            lss_rows = _read_lss_rows(fh, ("groups", "questions", "subquestions"))
+
+    questions_map, groups_map = _parse_lss_structure(lss_rows)
     
     # Build simple qid->title map for column renaming
     qid_to_title = {qid: d['title'] for qid, d in questions_map.items()}
     
     # Also include subquestions in qid_to_title if needed?
     # The original code did this:
-    for row in lss_root.findall(".//subquestions/rows/row"):
-        qid = row.find("qid").text
-        title = row.find("title").text
-        qid_to_title[qid] = title
-
-    text = xml_resp.decode("utf-8")
-    fieldnames = re.findall(r"<fieldname>(.*?)</fieldname>", text)
-
-    # Parse rows by XML to preserve order and decode CDATA
-    resp_root = ET.fromstring(xml_resp)
-    rows = resp_root.findall("./responses/rows/row")
-    records = []
-    for row in rows:
-        rec = {}
-        for child in row:
-            tag = child.tag.lstrip("_")
-            rec[tag] = child.text
-        records.append(rec)
-
-    df = pd.DataFrame(records)
-
-    rename_map = {f: _map_field_to_code(f, qid_to_title) for f in fieldnames}
-    df = df.rename(columns={k: v for k, v in rename_map.items() if k in df.columns})
+    for row in lss_rows["subquestions"]:
+        qid_to_title[row.get("qid")] = row.get("title")
+
+    df = pd.DataFrame(columns, index=pd.RangeIndex(n_rows))
+
+    rename_map = {f: _map_field_to_code(f, qid_to_title) for f in dict.fromkeys(fieldnames)}
+    df.columns = [rename_map.get(c, c) for c in df.columns]
 
     return df, questions_map, groups_map
 
@@ -88,25 +223,26 @@ def parse_lsa_timings(lsa_path):
                 return None
             
             with zf.open(timings_files[0]) as f:
-                xml_content = f.read()
+                root = _parse_xml_file(f)
                 
-        root = ET.fromstring(xml_content)
         rows = root.findall(".//row")
         if not rows:
             return None
             
-        records = []
-        for row in rows:
-            rec = {}
+        # One list per column, in order of first appearance; rows missing
+        # an element get NaN there
+        nan = float("nan")
+        columns = {}
+        for i, row in enumerate(rows):
             for child in row:
                 # Tag is like _244841X43550time
-                tag = child.tag
-                val = child.text
-                rec[tag] = val
-            records.append(rec)
-            
+                values = columns.get(child.tag)
+                if values is None:
+                    values = columns[child.tag] = [nan] * len(rows)
+                values[i] = child.text
+
         try:
-            return pd.DataFrame(records)
+            return pd.DataFrame(columns, index=pd.RangeIndex(len(rows)))
         except Exception as e:
             print(f"Error creating DataFrame in parse_lsa_timings: {e}")
             return None
@@ -116,91 +252,82 @@ def parse_lsa_timings(lsa_path):
 
 
 
-def _parse_lss_structure(root, get_text):
+def _parse_lss_structure(lss_rows):
     # 1. Parse Questions
     # Map qid -> {title, question, type, ...}
     questions_map = {}
     # Map gid -> title string (Group info)
     groups_map = {}
     
-    # Find the <groups> section to map Group ID -> Group Name (if available)
-    groups_section = root.find('groups')
-    if groups_section is not None:
-        rows = groups_section.find('rows')
-        if rows is not None:
-            for row in rows.findall('row'):
-                gid = get_text(row, 'gid')
-                name = get_text(row, 'group_name')
-                groups_map[gid] = name if name else ""
-
-    # Find the <questions> section
-    questions_section = root.find('questions')
-    if questions_section is not None:
-        rows = questions_section.find('rows')
-        if rows is not None:
-            for row in rows.findall('row'):
-                qid = get_text(row, 'qid')
-                gid = get_text(row, 'gid')
-                title = get_text(row, 'title') # This is usually the variable name (e.g. 'age', 'gender')
-                question_text = get_text(row, 'question')
-                q_type = get_text(row, 'type')
-                parent_qid = get_text(row, 'parent_qid')
-                
-                # Clean up CDATA or HTML tags from question text if necessary
-                clean_question = re.sub('<[^<]+?>', '', question_text or '').strip()
-                
-                questions_map[qid] = {
-                    'title': title,
-                    'question': clean_question,
-                    'type': q_type,
-                    'parent_qid': parent_qid,
-                    'gid': gid,
-                    'levels': {}
-                }
-                
-                # Update group map with a representative title if not set
-                if gid in groups_map and not groups_map[gid]:
-                    # Heuristic: use the first question's variable name prefix?
-                    # Or just the variable name.
-                    # If we have ADS01, ADS02, usually the group is ADS.
-                    # Let's try to strip digits.
-                    prefix = re.match(r"([a-zA-Z]+)", title)
-                    if prefix:
-                        groups_map[gid] = prefix.group(1)
-                    else:
-                        groups_map[gid] = title
+    # Rows of the <groups> section map Group ID -> Group Name (if available)
+    for row in lss_rows["groups"]:
+        gid = row.get('gid', '')
+        name = row.get('group_name', '')
+        groups_map[gid] = name if name else ""
+
+    # Rows of the <questions> section
+    for row in lss_rows["questions"]:
+        qid = row.get('qid', '')
+        gid = row.get('gid', '')
+        title = row.get('title', '') # This is usually the variable name (e.g. 'age', 'gender')
+        question_text = row.get('question', '')
+        q_type = row.get('type', '')
+        parent_qid = row.get('parent_qid', '')
+        
+        # Clean up CDATA or HTML tags from question text if necessary
+        clean_question = _HTML_TAG_RE.sub('', question_text or '').strip()
+        
+        questions_map[qid] = {
+            'title': title,
+            'question': clean_question,
+            'type': q_type,
+            'parent_qid': parent_qid,
+            'gid': gid,
+        }
+        
+        # Update group map with a representative title if not set
+        if gid in groups_map and not groups_map[gid]:
+            # Heuristic: use the first question's variable name prefix?
+            # Or just the variable name.
+            # If we have ADS01, ADS02, usually the group is ADS.
+            # Let's try to strip digits.
+            prefix = _ALPHA_PREFIX_RE.match(title)
+            if prefix:
+                groups_map[gid] = prefix.group(1)
+            else:
+                groups_map[gid] = title
 
     return questions_map, groups_map
 
 def parse_lss_xml(xml_content, task_name=None):
-    """Parse a LimeSurvey .lss XML blob into a Prism sidecar dict."""
+    """
+    Parse a LimeSurvey .lss XML blob into a Prism sidecar dict.
+
+    xml_content may be str, bytes or a binary file object.
+    """
+    if isinstance(xml_content, str):
+        xml_content = xml_content.encode("utf-8")
+    if isinstance(xml_content, bytes):
+        xml_content = io.BytesIO(xml_content)
     try:
-        root = ET.fromstring(xml_content)
+        # One streaming pass that reads just the sections used below
+        lss_rows = _read_lss_rows(xml_content, ("groups", "questions", "answers"))
     except ET.ParseError as e:
         print(f"Error parsing XML: {e}")
         return None
 
-    # Helper to find text of a child element
-    def get_text(element, tag):
-        child = element.find(tag)
-        val = child.text if child is not None else ""
-        return val or ""
-
-    questions_map, groups_map = _parse_lss_structure(root, get_text)
+    questions_map, groups_map = _parse_lss_structure(lss_rows)
 
     # 2. Parse Answers
-    # Map qid -> {code: answer, ...}
-    answers_section = root.find('answers')
-    if answers_section is not None:
-        rows = answers_section.find('rows')
-        if rows is not None:
-            for row in rows.findall('row'):
-                qid = get_text(row, 'qid')
-                code = get_text(row, 'code')
-                answer = get_text(row, 'answer')
-                
-                if qid in questions_map:
-                    questions_map[qid]['levels'][code] = answer
+    # Map qid -> {code: answer, ...}; only questions with answers get an entry
+    levels = {}
+    for row in lss_rows["answers"]:
+        qid = row.get('qid', '')
+        code = row.get('code', '')
+        answer = row.get('answer', '')
+        
+        if qid in questions_map:
+            levels.setdefault(qid, {})[code] = answer
 
     # 3. Construct Prism JSON
     prism_json = {}
@@ -217,8 +344,8 @@ def parse_lss_xml(xml_content, task_name=None):
             "Description": q_data['question']
         }
 
-        if q_data['levels']:
-            entry["Levels"] = q_data['levels']
+        if qid in levels:
+            entry["Levels"] = levels[qid]
 
         prism_json[key] = entry
 
@@ -240,7 +367,7 @@ def parse_lss_xml(xml_content, task_name=None):
         },
         "Metadata": {
             "SchemaVersion": "1.0.0",
-            "CreationDate": datetime.utcnow().strftime("%Y-%m-%d"),
+            "CreationDate": datetime.now(timezone.utc).date().isoformat(),
             "Creator": "limesurvey_to_prism.py",
         },
     }
@@ -255,8 +382,7 @@ def convert_lsa_to_prism(lsa_path, output_path=None, task_name=None):
         print(f"File not found: {lsa_path}")
         return
 
-    xml_content = None
-
+    # The .lss is parsed straight from the archive member / file
     if lsa_path.endswith('.lsa'):
         try:
             with zipfile.ZipFile(lsa_path, 'r') as zip_ref:
@@ -267,28 +393,33 @@ def convert_lsa_to_prism(lsa_path, output_path=None, task_name=None):
 
                 target_file = lss_files[0]
                 print(f"Processing {target_file} from archive...")
-                with zip_ref.open(target_file) as f:
-                    xml_content = f.read()
+                with _open_member(zip_ref, target_file) as f:
+                    prism_data = parse_lss_xml(f, task_name)
         except zipfile.BadZipFile:
             print("Invalid zip file.")
             return
     elif lsa_path.endswith('.lss'):
-        with open(lsa_path, 'rb') as f:
-            xml_content = f.read()
+        with open(lsa_path, 'rb', buffering=_XML_READ_BUFFER) as f:
+            prism_data = parse_lss_xml(f, task_name)
     else:
         print("Unsupported file extension. Please provide .lsa or .lss")
         return
 
-    if xml_content:
-        prism_data = parse_lss_xml(xml_content, task_name)
-
-        if prism_data:
-            if output_path:
-                with open(output_path, 'w', encoding='utf-8') as f:
-                    json.dump(prism_data, f, indent=4, ensure_ascii=False)
-                print(f"Successfully wrote Prism JSON to {output_path}")
+    if prism_data:
+        encoded = json_dumps(prism_data)
+        if output_path:
+            with open(output_path, 'wb') as f:
+                f.write(encoded)
+            print(f"Successfully wrote Prism JSON to {output_path}")
+        else:
+            stdout = getattr(sys.stdout, "buffer", None)
+            if stdout is None:
+                # Redirected to a text-only stream (e.g. io.StringIO)
+                print(encoded.decode("utf-8"))
             else:
-                print(json.dumps(prism_data, indent=4, ensure_ascii=False))
+                sys.stdout.flush()
+                stdout.write(encoded + b"\n")
+                stdout.flush()
 
 
 def convert_lsa_to_dataset(
@@ -300,34 +431,42 @@ def convert_lsa_to_dataset(
     id_priority=None,
     id_column=None,
     id_map=None,
+    schemas=None,
+    responses=None,
+    timings=None,
 ):
-    """Convert .lsa responses into a PRISM/BIDS dataset (tsv + json) using survey_library schemas."""
+    """
+    Convert .lsa responses into a PRISM/BIDS dataset (tsv + json) using survey_library schemas.
+
+    schemas may hold the already loaded library (see load_schemas); it is
+    copied before use, so callers can pass the same dict for many files.
+    responses and timings may hold the results of parse_lsa_responses and
+    parse_lsa_timings for lsa_path (an empty frame when there are no timings).
+    """
     base_priority = ["participant_id", "id", "code", "token", "subject"]
+    if responses is None:
+        responses = parse_lsa_responses(lsa_path)
+    df, questions_map, groups_map = responses
+
+    # Case-insensitive column lookup; the first of equally named columns wins
+    lower_cols = {}
+    for col in df.columns:
+        lower_cols.setdefault(col.lower(), col)
+
     if id_column:
         # Fail fast if the requested ID column is missing; do not silently fall back.
-        df_preview, questions_map, groups_map = parse_lsa_responses(lsa_path)
-        match = next((c for c in df_preview.columns if c.lower() == id_column.lower()), None)
+        match = lower_cols.get(id_column.lower())
         if not match:
-            available = ", ".join(df_preview.columns)
+            available = ", ".join(df.columns)
             raise ValueError(
                 f"ID column '{id_column}' not found in LimeSurvey responses. Available columns: {available}"
             )
-        # Ensure we still process the full dataframe below without re-reading from disk.
-        df = df_preview
         id_priority = [match] + base_priority
     else:
-        df, questions_map, groups_map = parse_lsa_responses(lsa_path)
         id_priority = id_priority or base_priority
 
     # Pick participant id column
-    id_col = None
-    for cand in id_priority:
-        for col in df.columns:
-            if col.lower() == cand.lower():
-                id_col = col
-                break
-        if id_col:
-            break
+    id_col = next((lower_cols[c.lower()] for c in id_priority if c.lower() in lower_cols), None)
     if not id_col:
         # Fallback: first column
         id_col = df.columns[0]
@@ -338,12 +477,12 @@ def convert_lsa_to_dataset(
         # Normalize IDs as strings
         df["participant_id"] = df["participant_id"].astype(str).str.strip()
 
-        # Prepare mapping keys (also normalized)
-        map_keys = set(str(k).strip() for k in id_map.keys())
+        # Prepare mapping (keys also normalized); used for both the check and the lookup
+        norm_map = {str(k).strip(): v for k, v in id_map.items()}
 
         # Find any LimeSurvey IDs present in the data that are not covered by the mapping
         ids_in_data = set(df["participant_id"].unique())
-        missing = sorted([i for i in ids_in_data if i not in map_keys])
+        missing = sorted([i for i in ids_in_data if i not in norm_map])
         if missing:
             # Abort rather than silently keeping unmapped IDs
             sample = ", ".join(missing[:50])
@@ -354,19 +493,21 @@ def convert_lsa_to_dataset(
             )
 
         # All IDs covered: apply mapping
-        df["participant_id"] = df["participant_id"].apply(lambda x: id_map.get(x, x))
+        df["participant_id"] = df["participant_id"].map(norm_map)
 
-    df["participant_id"] = df["participant_id"].apply(
-        lambda x: f"sub-{x}" if pd.notna(x) and not str(x).startswith("sub-") else x
-    )
+    ids = df["participant_id"]
+    id_text = ids.astype(str)
+    needs_prefix = ids.notna() & ~id_text.str.startswith("sub-")
+    df["participant_id"] = ids.where(~needs_prefix, "sub-" + id_text).infer_objects()
     df["session"] = session_label
 
     # --- Calculate Survey Duration and Start Time ---
     # LimeSurvey typically provides 'startdate' and 'submitdate'
     if "startdate" in df.columns and "submitdate" in df.columns:
         try:
-            start = pd.to_datetime(df["startdate"], errors="coerce")
-            submit = pd.to_datetime(df["submitdate"], errors="coerce")
+            # LimeSurvey writes timestamps as YYYY-MM-DD HH:MM:SS
+            start = pd.to_datetime(df["startdate"], format="%Y-%m-%d %H:%M:%S", errors="coerce")
+            submit = pd.to_datetime(df["submitdate"], format="%Y-%m-%d %H:%M:%S", errors="coerce")
             
             # Duration in minutes
             df["SurveyDuration"] = (submit - start).dt.total_seconds() / 60.0
@@ -380,7 +521,7 @@ def convert_lsa_to_dataset(
 
     # --- Merge Group Timings ---
     try:
-        timings_df = parse_lsa_timings(lsa_path)
+        timings_df = timings.copy() if timings is not None else parse_lsa_timings(lsa_path)
         
         group_duration_fields = {}
         if timings_df is not None and not timings_df.empty:
@@ -392,13 +533,13 @@ def convert_lsa_to_dataset(
                 clean_col = col.lstrip('_')
                 # Regex to find GroupID before 'time'
                 # The format is SurveyID X GroupID time. e.g. 244841X43550time
-                m = re.match(r'\d+X(\d+)time', clean_col)
+                m = _TIMING_RE.match(clean_col)
                 if m:
                     gid = m.group(1)
                     if gid in groups_map:
                         title = groups_map[gid]
                         # Sanitize title for column name
-                        safe_title = "".join(c if c.isalnum() else "_" for c in title)
+                        safe_title = _safe_colname(title)
                         col_name = f"Duration_{safe_title}"
                         new_cols[col] = col_name
                         group_duration_fields[col_name] = {
@@ -407,19 +548,20 @@ def convert_lsa_to_dataset(
                         }
             
             if new_cols:
-                timings_df = timings_df.rename(columns=new_cols)
+                timings_df.columns = [new_cols.get(c, c) for c in timings_df.columns]
                 # Keep only the renamed columns
                 # Use set to avoid duplicates if multiple groups map to same title (should be rare now)
                 # Filter columns that exist in timings_df (after rename)
                 timings_df = timings_df.loc[:, ~timings_df.columns.duplicated()]
                 
                 # Convert to numeric (seconds)
-                for c in timings_df.columns:
-                    if c.startswith("Duration_"):
-                        timings_df[c] = pd.to_numeric(timings_df[c], errors='coerce')
+                dur_cols = [c for c in timings_df.columns if c.startswith("Duration_")]
+                timings_df[dur_cols] = timings_df[dur_cols].apply(pd.to_numeric, errors='coerce')
                 
-                # Merge by index (assuming row alignment)
+                # Merge by position (assuming row alignment); sharing the index
+                # lets concat skip aligning the two frames
                 if len(df) == len(timings_df):
+                    timings_df.index = df.index
                     df = pd.concat([df, timings_df], axis=1)
                 else:
                     print(f"Warning: Timings row count ({len(timings_df)}) does not match responses ({len(df)}). Skipping timings.")
@@ -429,7 +571,12 @@ def convert_lsa_to_dataset(
         pass
 
     task_hint = task_name or sanitize_task_name(Path(lsa_path).stem)
-    schemas = load_schemas(library_path)
+    if schemas is None:
+        schemas = load_schemas(library_path)
+    else:
+        # Tasks get session metadata keys injected below (SurveyDuration is
+        # replaced, not edited); a copy per task keeps the caller's intact
+        schemas = {name: dict(schema) for name, schema in schemas.items()}
     if not schemas:
         print(f"No schemas found in {library_path}, cannot build dataset.")
         return
@@ -451,6 +598,13 @@ def convert_lsa_to_dataset(
         **group_duration_fields
     }
 
+    # Map question title -> gid, shared by all tasks below
+    title_to_gid = {v['title']: v['gid'] for v in questions_map.values()}
+    # Case-insensitive lookup of the merged columns (incl. group durations)
+    merged_lower_cols = {}
+    for col in df.columns:
+        merged_lower_cols.setdefault(col.lower(), col)
+
     # process_dataframe will copy needed sidecars into rawdata
     # We iterate manually to inject task-specific durations if available
     for t_name, t_schema in schemas.items():
@@ -458,8 +612,9 @@ def convert_lsa_to_dataset(
         if t_name == "limesurvey":
             continue
 
-        # Work on a copy to avoid side effects between tasks
-        task_df = df.copy()
+        # process_dataframe only reads the frame; a task-specific copy is made
+        # below only when its SurveyDuration is replaced
+        task_df = df
         
         # 1. Check for granular duration
         # Strategy: Find which group the task's variables belong to.
@@ -468,42 +623,37 @@ def convert_lsa_to_dataset(
         
         # Find which group these variables belong to
         gids = []
-        # Optimization: Create a map of title -> gid
-        title_to_gid = {v['title']: v['gid'] for v in questions_map.values()}
         
         for var in task_vars:
             if var in title_to_gid:
                 gids.append(title_to_gid[var])
             else:
                 # Fallback: check for prefix match (e.g. ADS01 -> ADS)
-                # We look for the longest matching prefix in title_to_gid
-                best_match = None
-                for title in title_to_gid:
-                    if var.startswith(title):
-                        if best_match is None or len(title) > len(best_match):
-                            best_match = title
-                
+                # We look for the longest matching prefix in title_to_gid by
+                # probing the prefixes of var, longest first
+                best_match = next(
+                    (var[:n] for n in range(len(var) - 1, 0, -1) if var[:n] in title_to_gid),
+                    None,
+                )
+
                 if best_match:
                     gids.append(title_to_gid[best_match])
         
         granular_col = None
         if gids:
-            # Find mode
-            from collections import Counter
-            most_common_gid = Counter(gids).most_common(1)[0][0]
+            # Find mode; ties go to the gid seen first
+            counts = Counter(gids)
+            most_common_gid = max(counts, key=counts.get)
             if most_common_gid in groups_map:
                 group_title = groups_map[most_common_gid]
-                safe_title = "".join(c if c.isalnum() else "_" for c in group_title)
+                safe_title = _safe_colname(group_title)
                 candidate = f"Duration_{safe_title}"
                 if candidate in task_df.columns:
                     granular_col = candidate
         
         # Fallback: try matching task name
         if not granular_col:
-            for col in task_df.columns:
-                if col.lower() == f"duration_{t_name}".lower():
-                    granular_col = col
-                    break
+            granular_col = merged_lower_cols.get(f"duration_{t_name}".lower())
         
         if t_name == "ads" and not granular_col:
             pass
@@ -526,9 +676,12 @@ def convert_lsa_to_dataset(
             # Granular is in seconds, convert to minutes to match schema unit
             # or update schema unit to seconds.
             # Let's update schema to seconds for precision.
-            t_schema["SurveyDuration"]["Units"] = "seconds"
-            t_schema["SurveyDuration"]["Description"] = f"Duration for task {t_name} (derived from group timing)"
-            task_df["SurveyDuration"] = task_df[granular_col]
+            t_schema["SurveyDuration"] = {
+                **t_schema["SurveyDuration"],
+                "Units": "seconds",
+                "Description": f"Duration for task {t_name} (derived from group timing)",
+            }
+            task_df = df.assign(SurveyDuration=df[granular_col])
             
             # Debug: Compare durations
             try:
@@ -543,6 +696,10 @@ def convert_lsa_to_dataset(
         process_dataframe(task_df, {t_name: t_schema}, output_root, library_path, session_override=session_label)
 
 
+_ID_MAP_SOURCE_COLUMNS = frozenset({'limesurvey_id', 'source_id', 'code', 'id'})
+_ID_MAP_TARGET_COLUMNS = frozenset({'participant_id', 'bids_id', 'sub_id', 'subject_id'})
+
+
 def load_id_mapping(map_path):
     """Load ID mapping from a TSV/CSV file.
     Expected columns: 'limesurvey_id', 'participant_id' (or first two columns).
@@ -561,8 +718,8 @@ def load_id_mapping(map_path):
         df = pd.read_csv(path, sep=sep, dtype=str)
         
         # Try to find standard columns, else take first two
-        src_col = next((c for c in df.columns if c.lower() in ['limesurvey_id', 'source_id', 'code', 'id']), None)
-        dst_col = next((c for c in df.columns if c.lower() in ['participant_id', 'bids_id', 'sub_id', 'subject_id']), None)
+        src_col = next((c for c in df.columns if c.lower() in _ID_MAP_SOURCE_COLUMNS), None)
+        dst_col = next((c for c in df.columns if c.lower() in _ID_MAP_TARGET_COLUMNS), None)
         
         if not src_col or not dst_col:
             if len(df.columns) >= 2:
@@ -585,8 +742,20 @@ def load_id_mapping(map_path):
         return None
 
 
-def batch_convert_lsa(input_root, output_root, session_map, library_path, task_fallback=None, id_column=None, id_map_file=None):
-    """Batch-convert .lsa/.lss under input_root into BIDS/PRISM datasets using survey library."""
+def _parse_lsa_archive(lsa_path):
+    """Parse responses and timings of one archive (batch worker entry point)."""
+    responses = parse_lsa_responses(lsa_path)
+    timings = parse_lsa_timings(lsa_path)
+    # An empty frame stands for "no timings", as None means "not parsed"
+    return responses, timings if timings is not None else pd.DataFrame()
+
+
+def batch_convert_lsa(input_root, output_root, session_map, library_path, task_fallback=None, id_column=None, id_map_file=None, workers=None):
+    """
+    Batch-convert .lsa/.lss under input_root into BIDS/PRISM datasets using survey library.
+
+    workers limits the processes used to parse the archives (default: one per CPU).
+    """
     input_root = Path(input_root)
     output_root = Path(output_root)
 
@@ -594,41 +763,111 @@ def batch_convert_lsa(input_root, output_root, session_map, library_path, task_f
     if id_map:
         print(f"Loaded {len(id_map)} ID mappings from {id_map_file}")
 
-    files = list(input_root.rglob("*.lsa")) + list(input_root.rglob("*.lss"))
+    # A single walk for both extensions; .lsa files still come first
+    lsa_files = []
+    lss_files = []
+    for dirpath, _dirnames, filenames in os.walk(input_root):
+        for name in filenames:
+            name_cased = os.path.normcase(name)
+            if name_cased.endswith(".lsa"):
+                lsa_files.append(Path(dirpath, name))
+            elif name_cased.endswith(".lss"):
+                lss_files.append(Path(dirpath, name))
+    files = lsa_files + lss_files
     if not files:
         print(f"No .lsa/.lss files found under {input_root}")
         return
 
     normalized_map = {k.lower(): v for k, v in session_map.items()}
+    # Keys searched within file stems, longest first, so that e.g. "t10" is
+    # not taken for "t1"
+    stem_keys = sorted(normalized_map, key=len, reverse=True)
+    # Session suffixes stripped from file stems to derive task names
+    session_suffix_res = [
+        re.compile(fr"[_\-]{raw}$", re.IGNORECASE) for raw in normalized_map
+    ]
+    # Matches if any of them does; most stems carry no session suffix
+    session_suffix_any = re.compile(
+        r"[_\-](?:" + "|".join(f"(?:{raw})" for raw in normalized_map) + r")$", re.IGNORECASE
+    )
+    # Parse the survey library once for all files
+    schemas = load_schemas(library_path)
 
+    # Resolve session and task per file first; files without a session key
+    # are reported in their turn below
+    plan = []
     for lsa_file in files:
-        parts_lower = [p.name.lower() for p in lsa_file.parents]
+        # Folder names from the nearest parent outwards, without building the
+        # chain of Path objects that lsa_file.parents would create
+        parts_lower = [name.lower() for name in reversed(lsa_file.parent.parts)]
         stem_lower = lsa_file.stem.lower()
         session_raw = next((p for p in parts_lower if p in normalized_map), None)
         if not session_raw:
-            session_raw = next((k for k in normalized_map if k in stem_lower), None)
+            session_raw = next((k for k in stem_keys if k in stem_lower), None)
         if not session_raw:
-            print(
-                f"Skipping {lsa_file}: no session key found (looked for {list(normalized_map.keys())}) in path or filename."
-            )
+            plan.append((lsa_file, None, None))
             continue
         session_label = normalized_map[session_raw]
 
         task_hint = lsa_file.stem
-        for raw in normalized_map.keys():
-            task_hint = re.sub(fr"[_\-]{raw}$", "", task_hint, flags=re.IGNORECASE)
+        if session_suffix_any.search(task_hint):
+            # Strip one key after the other, as stacked suffixes depend on it
+            for suffix_re in session_suffix_res:
+                task_hint = suffix_re.sub("", task_hint)
         task_name = sanitize_task_name(task_hint if task_hint else (task_fallback or "survey"))
-
-        print(f"Converting {lsa_file} -> session {session_label}, task {task_name}")
-        convert_lsa_to_dataset(
-            str(lsa_file),
-            str(output_root),
-            session_label,
-            library_path,
-            task_name=task_name,
-            id_column=id_column,
-            id_map=id_map,
-        )
+        plan.append((lsa_file, session_label, task_name))
+
+    # Parsing the archives (responses and group timings) is CPU-bound and
+    # independent per file, so it runs in worker processes. Datasets are still
+    # written one file at a time and in order, since all files share
+    # participants.tsv and the sidecars. Only a few archives are parsed ahead
+    # of the writer, so parsed results do not pile up in memory.
+    to_parse = [str(f) for f, session_label, _ in plan if session_label]
+    workers = min(workers or os.cpu_count() or 1, len(to_parse))
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        parsed = {}
+        pending = iter(to_parse)
+
+        def submit_next():
+            path = next(pending, None)
+            if path is not None:
+                parsed[path] = executor.submit(_parse_lsa_archive, path)
+
+        if executor:
+            for _ in range(2 * workers):
+                submit_next()
+
+        for lsa_file, session_label, task_name in plan:
+            if not session_label:
+                print(
+                    f"Skipping {lsa_file}: no session key found (looked for {list(normalized_map.keys())}) in path or filename."
+                )
+                continue
+
+            print(f"Converting {lsa_file} -> session {session_label}, task {task_name}")
+            future = parsed.pop(str(lsa_file), None)
+            if future:
+                # Keep the workers busy while this file is written
+                submit_next()
+                responses, timings = future.result()
+            else:
+                responses, timings = None, None
+            convert_lsa_to_dataset(
+                str(lsa_file),
+                str(output_root),
+                session_label,
+                library_path,
+                task_name=task_name,
+                id_column=id_column,
+                id_map=id_map,
+                schemas=schemas,
+                responses=responses,
+                timings=timings,
+            )
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Convert LimeSurvey .lsa/.lss to Prism JSON sidecar.")
@@ -9,7 +9,7 @@ def add_row(parent, data):
     row = ET.SubElement(parent, "row")
     for key, value in data.items():
         child = ET.SubElement(row, key)
-        child.text = str(value)
+        child.text = value if type(value) is str else str(value)
 
 
 def generate_lss(json_files, output_path=None):
@@ -5,17 +5,32 @@ without executing the top-level CLI script.
 """
 
 import os
+import re
 import sys
 import subprocess
 import json
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 
-from jsonschema import validate, ValidationError
+try:
+    import orjson
+
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+from jsonschema import ValidationError
 
 from schema_manager import load_all_schemas
 from schema_manager import validate_schema_version
-from validator import DatasetValidator, MODALITY_PATTERNS, resolve_sidecar_path
+from validator import (
+    DatasetValidator,
+    MODALITY_PATTERNS,
+    load_sidecar,
+)
 from stats import DatasetStats
-from system_files import filter_system_files
+from system_files import has_non_system_entry, is_system_file, scan_directory
 from bids_integration import check_and_update_bidsignore
 
 # Add current directory to path for imports
@@ -23,8 +38,39 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 if current_dir not in sys.path:
     sys.path.insert(0, current_dir)
 
+# Task label in a data filename (e.g. sub-01_task-rest_events.tsv)
+_TASK_RE = re.compile(r"_task-([A-Za-z0-9]+)(?:_|$)")
+_EVENTS_SUFFIXES = ("_events.tsv", "_events.tsv.gz")
+
+# Supported modality folder names, for reporting and membership tests
+MODALITY_KEYS_LIST = list(MODALITY_PATTERNS)
+MODALITY_KEYS_SET = frozenset(MODALITY_PATTERNS)
+
+
+# Minimum number of subjects for which validation is spread over processes.
+# Starting a spawn-based pool costs ~0.4-0.75 s against ~2-3 ms per
+# (survey-only) subject, so smaller datasets are faster in-process.
+PARALLEL_MIN_SUBJECTS = 500
+
+# Validator of a subject worker process, see _init_subject_worker
+_worker_validator = None
+
+
+def _init_subject_worker(schemas):
+    global _worker_validator
+    _worker_validator = DatasetValidator(schemas)
+
 
-def validate_dataset(root_dir, verbose=False, schema_version=None, run_bids=False):
+def _validate_subject_worker(subject_dir, subject_id, root_dir):
+    """Validate one subject in a worker process; returns (issues, stats)"""
+    stats = DatasetStats()
+    issues = _validate_subject(subject_dir, subject_id, _worker_validator, stats, root_dir)
+    return issues, stats
+
+
+def validate_dataset(
+    root_dir, verbose=False, schema_version=None, run_bids=False, workers=1
+):
     """Main dataset validation function (refactored from prism-validator.py)
 
     Args:
@@ -32,6 +78,9 @@ def validate_dataset(root_dir, verbose=False, schema_version=None, run_bids=Fals
         verbose: Enable verbose output
         schema_version: Schema version to use (e.g., 'stable', 'v0.1', '0.1')
         run_bids: Whether to run the standard BIDS validator
+        workers: Processes used to validate subjects (default: 1, i.e.
+            in-process; None for one per CPU). Datasets with fewer than
+            PARALLEL_MIN_SUBJECTS subjects are always validated in-process.
 
     Returns: (issues, stats)
     """
@@ -45,7 +94,7 @@ def validate_dataset(root_dir, verbose=False, schema_version=None, run_bids=Fals
     if verbose:
         version_tag = schema_version or "stable"
         print(f"📋 Loaded {len(schemas)} schemas (version: {version_tag})")
-        print(f"📁 Scanning modalities: {list(MODALITY_PATTERNS.keys())}")
+        print(f"📁 Scanning modalities: {MODALITY_KEYS_LIST}")
 
     # Initialize validator
     validator = DatasetValidator(schemas)
@@ -57,13 +106,13 @@ def validate_dataset(root_dir, verbose=False, schema_version=None, run_bids=Fals
     else:
         # Validate dataset_description.json against the dataset_description schema (if present)
         try:
-            with open(dataset_desc_path, "r", encoding="utf-8") as f:
-                dataset_desc = json.load(f)
+            with open(dataset_desc_path, "rb") as f:
+                dataset_desc = json_loads(f.read())
 
             dataset_schema = schemas.get("dataset_description")
             if dataset_schema:
                 issues.extend(validate_schema_version(dataset_desc, dataset_schema))
-                validate(instance=dataset_desc, schema=dataset_schema)
+                validator.validate_against_schema(dataset_desc, "dataset_description")
         except json.JSONDecodeError as e:
             issues.append(
                 ("ERROR", f"{dataset_desc_path} is not valid JSON: {e}")
@@ -78,7 +127,7 @@ def validate_dataset(root_dir, verbose=False, schema_version=None, run_bids=Fals
     # Check and update .bidsignore for BIDS-App compatibility
     try:
         added_rules = check_and_update_bidsignore(
-            root_dir, list(MODALITY_PATTERNS.keys())
+            root_dir, MODALITY_KEYS_LIST
         )
         if added_rules and verbose:
             print("ℹ️  Updated .bidsignore for BIDS-App compatibility:")
@@ -89,18 +138,43 @@ def validate_dataset(root_dir, verbose=False, schema_version=None, run_bids=Fals
             print(f"⚠️  Failed to update .bidsignore: {e}")
 
     # Walk through subject directories
-    all_items = os.listdir(root_dir)
-    filtered_items = filter_system_files(all_items)
-
-    if verbose and len(all_items) != len(filtered_items):
-        ignored_count = len(all_items) - len(filtered_items)
+    subject_entries = []
+    ignored_count = 0
+    with os.scandir(root_dir) as it:
+        for entry in it:
+            if is_system_file(entry.name):
+                ignored_count += 1
+            elif entry.name.startswith("sub-") and entry.is_dir():
+                subject_entries.append(entry)
+
+    if verbose and ignored_count:
         print(f"🗑️  Ignored {ignored_count} system files (.DS_Store, Thumbs.db, etc.)")
 
-    for item in filtered_items:
-        item_path = os.path.join(root_dir, item)
-        if os.path.isdir(item_path) and item.startswith("sub-"):
+    # Subjects are independent, so large datasets can be validated in worker
+    # processes (opt-in); results are collected in subject order
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(subject_entries))
+    if workers > 1 and len(subject_entries) >= PARALLEL_MIN_SUBJECTS:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_subject_worker,
+            initargs=(schemas,),
+        ) as executor:
+            results = executor.map(
+                _validate_subject_worker,
+                [entry.path for entry in subject_entries],
+                [entry.name for entry in subject_entries],
+                repeat(root_dir),
+                chunksize=max(1, len(subject_entries) // (4 * workers)),
+            )
+            for subject_issues, subject_stats in results:
+                issues.extend(subject_issues)
+                stats.merge(subject_stats)
+    else:
+        for entry in subject_entries:
             subject_issues = _validate_subject(
-                item_path, item, validator, stats, root_dir
+                entry.path, entry.name, validator, stats, root_dir
             )
             issues.extend(subject_issues)
 
@@ -127,6 +201,19 @@ def validate_dataset(root_dir, verbose=False, schema_version=None, run_bids=Fals
     return issues, stats
 
 
+def _run_json_report(cmd):
+    """Run a validator CLI with its stdout spooled to a temporary file.
+
+    Returns (report bytes, completed process). The report can be tens of MB
+    for large datasets, so it is parsed from bytes rather than decoded to a
+    str first.
+    """
+    with tempfile.TemporaryFile() as tf:
+        process = subprocess.run(cmd, stdout=tf, stderr=subprocess.PIPE, text=True)
+        tf.seek(0)
+        return tf.read(), process
+
+
 def _run_bids_validator(root_dir, verbose=False):
     """Run the standard BIDS validator CLI"""
     issues = []
@@ -146,16 +233,13 @@ def _run_bids_validator(root_dir, verbose=False):
         print("   Using Deno-based validator (jsr:@bids/validator)")
 
         # Run Deno validator
-        process = subprocess.run(
-            ["deno", "run", "-ERWN", "jsr:@bids/validator", root_dir, "--json"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
+        report, process = _run_json_report(
+            ["deno", "run", "-ERWN", "jsr:@bids/validator", root_dir, "--json"]
         )
 
-        if process.stdout:
+        if report:
             try:
-                bids_report = json.loads(process.stdout)
+                bids_report = json_loads(report)
                 
                 # Handle Deno validator structure
                 issue_list = []
@@ -226,16 +310,11 @@ def _run_bids_validator(root_dir, verbose=False):
         )
 
         # Run validation
-        process = subprocess.run(
-            ["bids-validator", root_dir, "--json"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-        )
+        report, process = _run_json_report(["bids-validator", root_dir, "--json"])
 
-        if process.stdout:
+        if report:
             try:
-                bids_report = json.loads(process.stdout)
+                bids_report = json_loads(report)
 
                 # Map BIDS issues to our format ("LEVEL", "Message")
                 for issue in bids_report.get("issues", {}).get("errors", []):
@@ -283,17 +362,12 @@ def _run_bids_validator(root_dir, verbose=False):
 def _validate_subject(subject_dir, subject_id, validator, stats, root_dir):
     issues = []
 
-    all_items = os.listdir(subject_dir)
-    filtered_items = filter_system_files(all_items)
-
-    for item in filtered_items:
-        item_path = os.path.join(subject_dir, item)
-        if os.path.isdir(item_path):
+    for entry in scan_directory(subject_dir):
+        item = entry.name
+        item_path = entry.path
+        if entry.is_dir():
             # Check for empty directory
-            dir_contents = os.listdir(item_path)
-            filtered_contents = filter_system_files(dir_contents)
-
-            if not filtered_contents:
+            if not has_non_system_entry(item_path):
                 issues.append(("ERROR", f"Empty directory found: {item_path}"))
                 continue
 
@@ -303,7 +377,7 @@ def _validate_subject(subject_dir, subject_id, validator, stats, root_dir):
                         item_path, subject_id, item, validator, stats, root_dir
                     )
                 )
-            elif item in MODALITY_PATTERNS:
+            elif item in MODALITY_KEYS_SET:
                 issues.extend(
                     _validate_modality_dir(
                         item_path, subject_id, None, item, validator, stats, root_dir
@@ -316,21 +390,16 @@ def _validate_subject(subject_dir, subject_id, validator, stats, root_dir):
 def _validate_session(session_dir, subject_id, session_id, validator, stats, root_dir):
     issues = []
 
-    all_items = os.listdir(session_dir)
-    filtered_items = filter_system_files(all_items)
-
-    for item in filtered_items:
-        item_path = os.path.join(session_dir, item)
-        if os.path.isdir(item_path):
+    for entry in scan_directory(session_dir):
+        item = entry.name
+        item_path = entry.path
+        if entry.is_dir():
             # Check for empty directory
-            dir_contents = os.listdir(item_path)
-            filtered_contents = filter_system_files(dir_contents)
-
-            if not filtered_contents:
+            if not has_non_system_entry(item_path):
                 issues.append(("ERROR", f"Empty directory found: {item_path}"))
                 continue
 
-            if item in MODALITY_PATTERNS:
+            if item in MODALITY_KEYS_SET:
                 issues.extend(
                     _validate_modality_dir(
                         item_path,
@@ -346,31 +415,32 @@ def _validate_session(session_dir, subject_id, session_id, validator, stats, roo
     return issues
 
 
+def _effective_modality_for_file(dir_modality, filename):
+    # In standard BIDS, events live inside func/ as *_events.tsv.
+    # Prism extends events metadata requirements via the `events` schema.
+    # The suffix test is case-insensitive (e.g. sub-01_EVENTS.tsv).
+    if filename.lower().endswith(_EVENTS_SUFFIXES):
+        return "events"
+    return dir_modality
+
+
 def _validate_modality_dir(
     modality_dir, subject_id, session_id, modality, validator, stats, root_dir
 ):
     issues = []
 
-    def _effective_modality_for_file(dir_modality, filename):
-        # In standard BIDS, events live inside func/ as *_events.tsv.
-        # Prism extends events metadata requirements via the `events` schema.
-        lower = filename.lower()
-        if lower.endswith("_events.tsv") or lower.endswith("_events.tsv.gz"):
-            return "events"
-        return dir_modality
+    # Sidecars parsed so far in this directory; each is read once and shared
+    # by sidecar validation, stats extraction and content validation
+    sidecar_cache = {}
 
-    all_files = os.listdir(modality_dir)
-    filtered_files = filter_system_files(all_files)
-
-    for fname in filtered_files:
-        file_path = os.path.join(modality_dir, fname)
-        if os.path.isfile(file_path):
+    for entry in scan_directory(modality_dir):
+        fname = entry.name
+        file_path = entry.path
+        if entry.is_file():
             # Extract task from filename
             task = None
             if "_task-" in fname:
-                import re
-
-                task_match = re.search(r"_task-([A-Za-z0-9]+)(?:_|$)", fname)
+                task_match = _TASK_RE.search(fname)
                 if task_match:
                     task = task_match.group(1)
 
@@ -387,32 +457,31 @@ def _validate_modality_dir(
             if not fname.endswith(".json"):
                 sidecar_modality = _effective_modality_for_file(modality, fname)
                 sidecar_issues = validator.validate_sidecar(
-                    file_path, sidecar_modality, root_dir
+                    file_path, sidecar_modality, root_dir, sidecar_cache
                 )
                 issues.extend(sidecar_issues)
 
                 # Extract OriginalName for stats
                 try:
-                    sidecar_path = resolve_sidecar_path(file_path, root_dir)
+                    sidecar_path = validator.resolve_sidecar(file_path, root_dir)
                     if os.path.exists(sidecar_path):
-                        with open(sidecar_path, "r", encoding="utf-8") as f:
-                            data = json.load(f)
-                            if "Study" in data and "OriginalName" in data["Study"]:
-                                original_name = data["Study"]["OriginalName"]
-                                if modality == "survey" and task:
-                                    stats.add_description("survey", task, original_name)
-                                elif modality == "biometrics" and task:
-                                    stats.add_description(
-                                        "biometrics", task, original_name
-                                    )
-                                elif task:
-                                    stats.add_description("task", task, original_name)
+                        data = load_sidecar(sidecar_path, sidecar_cache)
+                        if "Study" in data and "OriginalName" in data["Study"]:
+                            original_name = data["Study"]["OriginalName"]
+                            if modality == "survey" and task:
+                                stats.add_description("survey", task, original_name)
+                            elif modality == "biometrics" and task:
+                                stats.add_description(
+                                    "biometrics", task, original_name
+                                )
+                            elif task:
+                                stats.add_description("task", task, original_name)
                 except Exception:
                     pass  # Don't fail validation if stats extraction fails
 
                 # Validate data content
                 content_issues = validator.validate_data_content(
-                    file_path, modality, root_dir
+                    file_path, modality, root_dir, sidecar_cache
                 )
                 issues.extend(content_issues)
 
@@ -77,6 +77,35 @@ class DatasetStats:
             if task:
                 subject_info["session_data"][session_id]["tasks"].add(task)
 
+    def merge(self, other):
+        """Add the statistics collected in another DatasetStats (e.g. by a worker process)"""
+        self.subjects |= other.subjects
+        self.sessions |= other.sessions
+        for modality, count in other.modalities.items():
+            self.modalities[modality] = self.modalities.get(modality, 0) + count
+        self.tasks |= other.tasks
+        self.surveys |= other.surveys
+        self.biometrics |= other.biometrics
+        for entity_type, names in other.descriptions.items():
+            self.descriptions.setdefault(entity_type, {}).update(names)
+        self.total_files += other.total_files
+        self.sidecar_files += other.sidecar_files
+
+        for subject_id, other_info in other.subject_data.items():
+            if subject_id not in self.subject_data:
+                self.subject_data[subject_id] = other_info
+                continue
+            subject_info = self.subject_data[subject_id]
+            subject_info["sessions"] |= other_info["sessions"]
+            subject_info["modalities"] |= other_info["modalities"]
+            subject_info["tasks"] |= other_info["tasks"]
+            for session_id, other_session in other_info["session_data"].items():
+                session_info = subject_info["session_data"].setdefault(
+                    session_id, {"modalities": set(), "tasks": set()}
+                )
+                session_info["modalities"] |= other_session["modalities"]
+                session_info["tasks"] |= other_session["tasks"]
+
     def add_description(self, entity_type, name, description):
         """Store description (OriginalName) for an entity"""
         if not description:
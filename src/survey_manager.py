@@ -1,10 +1,43 @@
 import json
 import shutil
 import os
+import time
 from pathlib import Path
-from datetime import datetime
 from library_validator import LibraryValidator
 
+try:
+    import orjson
+
+    json_loads = orjson.loads
+
+    def json_dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+except ImportError:
+    json_loads = json.loads
+
+    def json_dumps(obj):
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+
+
+def _scan_json_files(directory):
+    """
+    Yield (filename, mtime) of the JSON files in a directory.
+    One scandir pass; the stat result of each entry is reused.
+    """
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            # normcase keeps the case-insensitive match glob() has on Windows
+            if os.path.normcase(entry.name).endswith(".json") and entry.is_file():
+                yield entry.name, entry.stat().st_mtime
+
+
+def _format_mtime(mtime):
+    """
+    Format a timestamp as local "YYYY-MM-DD HH:MM".
+    """
+    t = time.localtime(mtime)
+    return f"{t.tm_year:04d}-{t.tm_mon:02d}-{t.tm_mday:02d} {t.tm_hour:02d}:{t.tm_min:02d}"
+
 
 class SurveyManager:
     """
@@ -26,30 +59,26 @@ class SurveyManager:
         surveys = {}
 
         # 1. Scan Golden Masters
-        for f in self.lib_path.glob("*.json"):
-            surveys[f.name] = {
-                "filename": f.name,
+        for name, mtime in _scan_json_files(self.lib_path):
+            surveys[name] = {
+                "filename": name,
                 "has_master": True,
                 "has_draft": False,
-                "master_mtime": datetime.fromtimestamp(f.stat().st_mtime).strftime(
-                    "%Y-%m-%d %H:%M"
-                ),
+                "master_mtime": _format_mtime(mtime),
             }
 
         # 2. Scan Drafts
-        for f in self.drafts_path.glob("*.json"):
-            if f.name not in surveys:
-                surveys[f.name] = {
-                    "filename": f.name,
+        for name, mtime in _scan_json_files(self.drafts_path):
+            if name not in surveys:
+                surveys[name] = {
+                    "filename": name,
                     "has_master": False,
                     "has_draft": True,
                 }
             else:
-                surveys[f.name]["has_draft"] = True
+                surveys[name]["has_draft"] = True
             
-            surveys[f.name]["draft_mtime"] = datetime.fromtimestamp(f.stat().st_mtime).strftime(
-                "%Y-%m-%d %H:%M"
-            )
+            surveys[name]["draft_mtime"] = _format_mtime(mtime)
 
         return sorted(surveys.values(), key=lambda x: x["filename"])
 
@@ -76,8 +105,8 @@ class SurveyManager:
             # But strictly speaking, we should edit drafts.
             raise FileNotFoundError(f"Draft {filename} not found.")
 
-        with open(draft_file, "r", encoding="utf-8") as f:
-            return json.load(f)
+        with open(draft_file, "rb") as f:
+            return json_loads(f.read())
 
     def save_draft(self, filename, content):
         """
@@ -86,11 +115,11 @@ class SurveyManager:
         draft_file = self.drafts_path / filename
         
         # Ensure it's valid JSON before saving
-        if isinstance(content, str):
-            content = json.loads(content)
+        if isinstance(content, (str, bytes, bytearray)):
+            content = json_loads(content)
             
-        with open(draft_file, "w", encoding="utf-8") as f:
-            json.dump(content, f, indent=2, ensure_ascii=False)
+        with open(draft_file, "wb") as f:
+            f.write(json_dumps(content))
         
         return True
 
@@ -107,13 +136,14 @@ class SurveyManager:
 
         # Validate draft content
         try:
-            with open(draft_file, "r", encoding="utf-8") as f:
-                content = json.load(f)
+            with open(draft_file, "rb") as f:
+                content = json_loads(f.read())
             
             errors = self.validator.validate_draft(content, filename)
             if errors:
                 raise ValueError("Validation failed:\n" + "\n".join(errors))
                 
+        # orjson.JSONDecodeError is a subclass of json.JSONDecodeError
         except json.JSONDecodeError:
             raise ValueError(f"Draft {filename} contains invalid JSON.")
 
@@ -3,7 +3,9 @@ System file filtering utilities for cross-platform dataset validation.
 Filters out OS-specific files that shouldn't be included in validation.
 """
 
+import fnmatch
 import os
+import re
 
 # System files to ignore during validation
 SYSTEM_FILES = {
@@ -51,6 +53,19 @@ SYSTEM_FILE_PATTERNS = {
 }
 
 
+# Frozen copy of SYSTEM_FILES for the exact-name test in is_system_file
+SYSTEM_FILES_FROZEN = frozenset(SYSTEM_FILES)
+
+# SYSTEM_FILE_PATTERNS as one regex; names are normcased before matching,
+# like fnmatch.fnmatch does
+_SYSTEM_FILE_PATTERN_RE = re.compile(
+    "|".join(
+        fnmatch.translate(os.path.normcase(pattern))
+        for pattern in sorted(SYSTEM_FILE_PATTERNS)
+    )
+)
+
+
 def is_system_file(filename):
     """
     Check if a filename is a system file that should be ignored during validation.
@@ -65,17 +80,11 @@ def is_system_file(filename):
         return True
 
     # Check exact matches
-    if filename in SYSTEM_FILES:
+    if filename in SYSTEM_FILES_FROZEN:
         return True
 
     # Check patterns
-    import fnmatch
-
-    for pattern in SYSTEM_FILE_PATTERNS:
-        if fnmatch.fnmatch(filename, pattern):
-            return True
-
-    return False
+    return _SYSTEM_FILE_PATTERN_RE.match(os.path.normcase(filename)) is not None
 
 
 def filter_system_files(file_list):
@@ -91,6 +100,34 @@ def filter_system_files(file_list):
     return [f for f in file_list if not is_system_file(f)]
 
 
+def scan_directory(directory):
+    """
+    List a directory with system files filtered out.
+
+    Args:
+        directory (str): Path of the directory to list
+
+    Returns:
+        list: os.DirEntry objects of the remaining entries, in directory order
+    """
+    with os.scandir(directory) as entries:
+        return [entry for entry in entries if not is_system_file(entry.name)]
+
+
+def has_non_system_entry(directory):
+    """
+    Check whether a directory contains anything besides system files.
+
+    Args:
+        directory (str): Path of the directory to check
+
+    Returns:
+        bool: True as soon as one non-system entry is found
+    """
+    with os.scandir(directory) as entries:
+        return any(not is_system_file(entry.name) for entry in entries)
+
+
 def should_validate_file(file_path):
     """
     Check if a file should be included in dataset validation.
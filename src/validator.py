@@ -7,7 +7,10 @@ import re
 import json
 import csv
 from datetime import datetime
-from jsonschema import validate, ValidationError
+from functools import lru_cache
+from jsonschema import ValidationError
+from jsonschema.exceptions import best_match
+from jsonschema.validators import validator_for
 from schema_manager import validate_schema_version
 from cross_platform import (
     normalize_path,
@@ -29,6 +32,12 @@ MODALITY_PATTERNS = {
     "dwi": r".+_dwi(\.nii(\.gz)?|\.bvec|\.bval)$",
 }
 
+# Compiled once; validate_filename runs for every file
+_MODALITY_REGEXES = {
+    modality: re.compile(pattern) for modality, pattern in MODALITY_PATTERNS.items()
+}
+_ANY_FILENAME_REGEX = re.compile(r".*")
+
 # BIDS naming patterns
 BIDS_REGEX = re.compile(
     r"^sub-[a-zA-Z0-9]+"
@@ -72,8 +81,12 @@ def _extract_entity_value(stem, key):
     return None
 
 
-def resolve_sidecar_path(file_path, root_dir):
-    """Return best-matching sidecar path, supporting dataset-level survey sidecars."""
+def resolve_sidecar_path(file_path, root_dir, dataset_file_exists=os.path.exists):
+    """Return best-matching sidecar path, supporting dataset-level survey sidecars.
+
+    dataset_file_exists is used to probe the dataset-level candidates; pass a
+    memoized os.path.exists to avoid repeating those probes for every file.
+    """
     candidate = derive_sidecar_path(file_path)
     if os.path.exists(candidate):
         return candidate
@@ -112,27 +125,78 @@ def resolve_sidecar_path(file_path, root_dir):
             if not directory:
                 continue
             dataset_candidate = safe_path_join(directory, file_name)
-            if os.path.exists(dataset_candidate):
+            if dataset_file_exists(dataset_candidate):
                 return dataset_candidate
 
     return candidate
 
 
+def load_sidecar(sidecar_path, cache=None):
+    """Read and parse a JSON sidecar, memoized in cache (a dict) when given."""
+    if cache is not None and sidecar_path in cache:
+        return cache[sidecar_path]
+    sidecar_data = json.loads(CrossPlatformFile.read_text(sidecar_path))
+    if cache is not None:
+        cache[sidecar_path] = sidecar_data
+    return sidecar_data
+
+
 class DatasetValidator:
     """Main dataset validation class"""
 
     def __init__(self, schemas=None):
         self.schemas = schemas or {}
-
-    def validate_data_content(self, file_path, modality, root_dir):
-        """Validate data content against constraints in sidecar"""
+        # Schema name -> compiled jsonschema validator, see validate_against_schema
+        self._schema_validators = {}
+        # Dataset-level sidecars are probed for every data file without its
+        # own sidecar; the answers do not change during a validation run
+        self._dataset_file_exists = lru_cache(maxsize=None)(os.path.exists)
+        # (file_path, root_dir, sidecar_path) of the last resolve_sidecar call
+        self._last_sidecar = None
+
+    def resolve_sidecar(self, file_path, root_dir):
+        """Return the sidecar path of a data file, see resolve_sidecar_path.
+
+        Sidecar validation, stats extraction and content validation all ask
+        for the same file in a row, so the last result is reused.
+        """
+        last = self._last_sidecar
+        if last is not None and last[0] == file_path and last[1] == root_dir:
+            return last[2]
+        sidecar_path = resolve_sidecar_path(
+            file_path, root_dir, self._dataset_file_exists
+        )
+        self._last_sidecar = (file_path, root_dir, sidecar_path)
+        return sidecar_path
+
+    def validate_against_schema(self, instance, schema_name):
+        """Validate instance against a loaded schema, like jsonschema.validate.
+
+        Raises the best-matching ValidationError. The validator for each
+        schema is built (and the schema itself checked) once and reused.
+        """
+        schema_validator = self._schema_validators.get(schema_name)
+        if schema_validator is None:
+            schema = self.schemas[schema_name]
+            cls = validator_for(schema)
+            cls.check_schema(schema)
+            schema_validator = self._schema_validators[schema_name] = cls(schema)
+        error = best_match(schema_validator.iter_errors(instance))
+        if error is not None:
+            raise error
+
+    def validate_data_content(self, file_path, modality, root_dir, sidecar_cache=None):
+        """Validate data content against constraints in sidecar
+
+        sidecar_cache: optional dict of already parsed sidecars, see load_sidecar
+        """
         issues = []
 
         # Only validate content for tabular data modalities
         if modality not in ["survey", "biometrics"]:
             return issues
 
-        sidecar_path = resolve_sidecar_path(file_path, root_dir)
+        sidecar_path = self.resolve_sidecar(file_path, root_dir)
         if not os.path.exists(sidecar_path):
             # Missing sidecar is already reported by validate_sidecar
             return issues
@@ -148,8 +212,7 @@ class DatasetValidator:
                 ]
 
             # Load sidecar
-            sidecar_content = CrossPlatformFile.read_text(sidecar_path)
-            sidecar_data = json.loads(sidecar_content)
+            sidecar_data = load_sidecar(sidecar_path, sidecar_cache)
 
             # Read TSV file
             with open(file_path, "r", newline="", encoding="utf-8") as tsvfile:
@@ -429,7 +492,7 @@ class DatasetValidator:
             issues.append(("WARNING", issue))
 
         base, ext = split_compound_ext(filename)
-        pattern = re.compile(MODALITY_PATTERNS.get(modality, r".*"))
+        pattern = _MODALITY_REGEXES.get(modality, _ANY_FILENAME_REGEX)
         is_sidecar = filename.endswith(".json")
 
         # Check BIDS naming
@@ -487,9 +550,12 @@ class DatasetValidator:
 
         return issues
 
-    def validate_sidecar(self, file_path, modality, root_dir):
-        """Validate JSON sidecar against schema"""
-        sidecar_path = resolve_sidecar_path(file_path, root_dir)
+    def validate_sidecar(self, file_path, modality, root_dir, sidecar_cache=None):
+        """Validate JSON sidecar against schema
+
+        sidecar_cache: optional dict of already parsed sidecars, see load_sidecar
+        """
+        sidecar_path = self.resolve_sidecar(file_path, root_dir)
         issues = []
 
         if not os.path.exists(sidecar_path):
@@ -497,15 +563,14 @@ class DatasetValidator:
 
         try:
             # Use cross-platform file reading
-            content = CrossPlatformFile.read_text(sidecar_path)
-            sidecar_data = json.loads(content)
+            sidecar_data = load_sidecar(sidecar_path, sidecar_cache)
 
             # Validate against schema if available
             schema = self.schemas.get(modality)
             if schema:
                 # Version compatibility checks (only warns when explicitly specified and incompatible)
                 issues.extend(validate_schema_version(sidecar_data, schema))
-                validate(instance=sidecar_data, schema=schema)
+                self.validate_against_schema(sidecar_data, modality)
 
         except ValidationError as e:
             issues.append(